@@ -0,0 +1,51 @@
+"""
+METARMap background jobs
+
+Runs slow, blocking work for the settings app (weather fetches, git fetch,
+journalctl) on a small thread pool so the server's request threads aren't tied
+up by it. Jobs are keyed: submitting a key that is already running returns the
+job in flight instead of starting a second copy, so ten browsers asking for the
+same log at once cost one journalctl.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundJobs:
+    """A thread pool that runs at most one job per key at a time."""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background")
+        self._in_flight = {}  # Key -> Future
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, *args, **kwargs):
+        """Start func(*args, **kwargs) under key, or return the Future of the job already running under it."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(func, *args, **kwargs)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return future
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def run(self, key, func, *args, timeout=None, **kwargs):
+        """
+        Submit a job and wait up to timeout seconds for its result.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the job is still running after timeout seconds
+                (it keeps running and later callers share it)
+        """
+        return self.submit(key, func, *args, **kwargs).result(timeout)
+
+    def running(self, key):
+        with self._lock:
+            return key in self._in_flight
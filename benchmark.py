@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+METARMap Benchmarks
+Measures the hot paths of the weather parsing and animation code off the Pi.
+
+Usage:
+    python benchmark.py tokenizer [--count 4000] [--repeat 3]
+    python benchmark.py animations [--sizes 50 500 2000] [--duration 5] [--unthrottled] [--pure-python]
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+
+import weather
+
+
+#######------ LEGACY REFERENCE IMPLEMENTATIONS ------#######
+# Copies of the per-call regex scans tokenize_metar replaced, kept here so the
+# benchmark always compares against the original behaviour and speed.
+
+def legacy_parse_visibility(raw_metar):
+    visibility_pattern = re.compile(r'(\d{1,2}|\d/\d|M\d/\d)SM')
+    for part in raw_metar.split():
+        vis_match = visibility_pattern.match(part)
+        if vis_match:
+            vis_str = vis_match.group(1)
+            if vis_str.startswith('M'):
+                vis_str = vis_str[1:]
+            if '/' in vis_str:
+                numerator, denominator = vis_str.split('/')
+                return float(numerator) / float(denominator)
+            return float(vis_str)
+    return None
+
+def legacy_parse_ceiling(raw_metar):
+    cloud_pattern = re.compile(r'(FEW|SCT|BKN|OVC|VV)(\d{3})?(CB|TCU)?')
+    ceiling_layers = []
+    for part in raw_metar.split():
+        cloud_match = cloud_pattern.match(part)
+        if cloud_match:
+            type_str, altitude_str, cloud_type = cloud_match.groups()
+            if type_str in ['BKN', 'OVC'] and altitude_str:
+                ceiling_layers.append(int(altitude_str) * 100)
+    return min(ceiling_layers) if ceiling_layers else None
+
+def legacy_flight_category(raw_metar):
+    visibility = legacy_parse_visibility(raw_metar)
+    ceiling = legacy_parse_ceiling(raw_metar)
+    if visibility is None:
+        return 'MISSING'
+    if visibility >= 5.0:
+        return 'VFR' if ceiling is None or ceiling >= 3000 else 'MVFR'
+    elif visibility >= 3.0:
+        return 'MVFR' if ceiling is None or ceiling >= 1000 else 'IFR'
+    elif visibility >= 1.0:
+        return 'IFR' if ceiling is None or ceiling >= 500 else 'LIFR'
+    return 'LIFR'
+
+def legacy_has_keyword(raw_metar, keywords):
+    return any(re.search(rf'\b{keyword}\b', raw_metar) for keyword in keywords)
+
+
+#######------ SYNTHETIC DATA ------#######
+
+VISIBILITIES = ['10SM', '10SM', '10SM', '7SM', '5SM', '3SM', '2SM', '1SM', '1/2SM', '3/4SM', 'M1/4SM']
+WEATHER_GROUPS = ['', '', '', '', 'BR', '-RA', 'RA', '+TSRA', 'VCTS', 'TS', '-SN', 'SN', '+SN',
+                  'BLSN', 'DRSN', '-SHSN', 'FZRA', 'GS', 'HZ', 'FG', '-RA BR', 'SN BR']
+COVERS = ['FEW', 'SCT', 'BKN', 'OVC']
+REMARKS = ['AO2', 'AO2 SLP132', 'AO2 LTG DSNT W', 'AO2 SNINCR 1/10', 'AO2 TSB05', 'AO2 PK WND 28045/1530']
+
+def synthetic_metar(rng, station):
+    """Build one plausible raw METAR string."""
+    parts = ['METAR', station, f"{rng.randint(1, 28):02d}{rng.randint(0, 23):02d}{rng.choice(['53', '56'])}Z"]
+    if rng.random() < 0.3:
+        parts.append('AUTO')
+    speed = rng.randint(0, 35)
+    wind = f"{rng.choice(['VRB', f'{rng.randint(0, 36) * 10:03d}'])}{speed:02d}"
+    if speed > 12 and rng.random() < 0.5:
+        wind += f"G{speed + rng.randint(5, 20)}"
+    parts.append(wind + 'KT')
+    parts.append(rng.choice(VISIBILITIES))
+    group = rng.choice(WEATHER_GROUPS)
+    if group:
+        parts.append(group)
+    for _ in range(rng.randint(0, 3)):
+        parts.append(f"{rng.choice(COVERS)}{rng.randint(2, 250):03d}{rng.choice(['', '', '', 'CB'])}")
+    if rng.random() < 0.1:
+        parts.append('CLR')
+    parts.append(f"{rng.randint(-10, 35):02d}/{rng.randint(-15, 20):02d}".replace('-', 'M'))
+    parts.append(f"A{rng.randint(2900, 3050)}")
+    parts.append('RMK')
+    parts.append(rng.choice(REMARKS))
+    return ' '.join(parts)
+
+def synthetic_corpus(count, seed=1):
+    """Return a list of count synthetic METAR strings."""
+    rng = random.Random(seed)
+    return [synthetic_metar(rng, f"K{i:03d}"[-4:]) for i in range(count)]
+
+
+#######------ BENCHMARKS ------#######
+
+def _best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark_tokenizer(count, repeat):
+    """Compare the legacy regex scans with tokenize_metar on a synthetic corpus."""
+    corpus = synthetic_corpus(count)
+
+    def run_legacy():
+        for raw in corpus:
+            legacy_flight_category(raw)
+            legacy_has_keyword(raw, weather.LIGHTNING_KEYWORDS)
+            legacy_has_keyword(raw, weather.SNOW_KEYWORDS)
+
+    def run_tokenizer_cold():
+        weather.tokenize_metar.cache_clear()
+        for raw in corpus:
+            weather.determine_flight_category(raw)
+            record = weather.tokenize_metar(raw)
+            record.lightning
+            record.snow
+
+    def run_tokenizer_warm():
+        for raw in corpus:
+            weather.determine_flight_category(raw)
+            record = weather.tokenize_metar(raw)
+            record.lightning
+            record.snow
+
+    # Check the tokenizer agrees with the legacy functions before timing anything
+    mismatches = 0
+    for raw in corpus:
+        record = weather.tokenize_metar(raw)
+        legacy = (legacy_flight_category(raw),
+                  legacy_has_keyword(raw, weather.LIGHTNING_KEYWORDS),
+                  legacy_has_keyword(raw, weather.SNOW_KEYWORDS))
+        if (weather.determine_flight_category(raw), record.lightning, record.snow) != legacy:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"Mismatch: {raw}")
+
+    legacy_time = _best_of(repeat, run_legacy)
+    cold_time = _best_of(repeat, run_tokenizer_cold)
+    # The warm run measures the display loop case where observations repeat until the next fetch
+    if count <= weather.tokenize_metar.cache_info().maxsize:
+        warm_time = _best_of(repeat, run_tokenizer_warm)
+    else:
+        warm_time = None
+
+    print(f"\nMETAR tokenizer benchmark ({count} observations, best of {repeat})")
+    print("-" * 60)
+    print(f"{'Legacy regex scans':<28} {legacy_time * 1000:>10.1f} ms  {legacy_time / count * 1e6:>8.2f} us/obs")
+    print(f"{'tokenize_metar (cold)':<28} {cold_time * 1000:>10.1f} ms  {cold_time / count * 1e6:>8.2f} us/obs  x{legacy_time / cold_time:.1f}")
+    if warm_time is not None:
+        print(f"{'tokenize_metar (cached)':<28} {warm_time * 1000:>10.1f} ms  {warm_time / count * 1e6:>8.2f} us/obs  x{legacy_time / warm_time:.1f}")
+    else:
+        print(f"{'tokenize_metar (cached)':<28} skipped, corpus larger than the tokenizer cache")
+    print(f"Result mismatches vs legacy: {mismatches}")
+    return mismatches == 0
+
+
+#######------ ANIMATION BENCHMARKS ------#######
+# The animation functions in metar.py are driven against a virtual strip with
+# every LED windy, snowy and lightning-struck, which is the worst case for the
+# per-frame loops. metar.time is swapped for a meter that records how long each
+# animation sleeps, so the time left between two show() calls is the work done
+# for that frame.
+
+# Windy (27025G35KT), thunderstorm with snow (+TSSN) and LTG in the remarks
+WORST_CASE_METAR = "METAR {station} 011853Z 27025G35KT 2SM +TSSN BKN008 OVC015 M02/M04 A2992 RMK AO2 LTG DSNT W"
+
+class SleepMeter:
+    """Stand-in for the time module that records (or skips) every sleep."""
+
+    def __init__(self, throttled=True):
+        self.throttled = throttled
+        self.slept = 0.0
+        self.skipped = 0.0  # Seconds of sleep skipped when unthrottled
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if not self.throttled:
+            self.skipped += seconds
+            return
+        start = time.perf_counter()
+        time.sleep(seconds)
+        self.slept += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+def make_frame_recorder(num_pixels, meter):
+    """Return a FrameBuffer over a VirtualStrip that timestamps every show() call."""
+    import leds
+
+    class FrameRecorder(leds.FrameBuffer):
+        def __init__(self):
+            super().__init__(leds.VirtualStrip(num_pixels, brightness=1.0, max_frames=1), num_pixels)
+            self.marks = []  # (perf_counter, total slept) after each show()
+
+        def show(self):
+            sent = super().show()
+            self.marks.append((time.perf_counter(), meter.slept))
+            return sent
+
+    return FrameRecorder()
+
+def synthetic_weather(num_leds):
+    """Parsed weather for num_leds stations that all trigger every animation."""
+    features = []
+    for i in range(num_leds):
+        station = f"B{i:04d}"
+        raw = WORST_CASE_METAR.format(station=station)
+        features.append({"properties": {"icaoId": station, "rawOb": raw, "wspd": 25, "wgst": 35,
+                                        "fltcat": weather.determine_flight_category(raw)}})
+    return weather.parse_weather({"features": features})
+
+def frame_stats(start, marks, budget):
+    """Summarize per-frame work time (wall time between shows minus sleeps)."""
+    work = []
+    last_time, last_slept = start, 0.0
+    for mark_time, slept in marks:
+        work.append(max(0.0, (mark_time - last_time) - (slept - last_slept)))
+        last_time, last_slept = mark_time, slept
+    if not work:
+        return None
+    ordered = sorted(work)
+
+    def percentile(pct):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    return {
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": ordered[-1],
+        "mean": statistics.fmean(work),
+        "missed": sum(1 for value in work if value > budget)
+    }
+
+def benchmark_animations(sizes, duration, throttled, pure_python=False):
+    """Run each animation at each LED count and report fps, frame times, missed deadlines and CPU."""
+    # Never touch real hardware from the benchmark
+    os.environ.setdefault('METAR_LED_BACKEND', 'virtual')
+    import compositor
+    import metar
+    from deadlines import DeadlineScheduler
+    logging.getLogger().setLevel(logging.WARNING)
+
+    original = (metar.pixels, metar.NUM_PIXELS, metar.airport_layout, metar.SNOWY_ANIMATION_DURATION,
+                metar.time, compositor.time, compositor.np, metar.compositor)
+    if pure_python:
+        # Force the plain Python kernels even when numpy is installed
+        compositor.np = None
+    meter = SleepMeter(throttled)
+    metar.time = compositor.time = meter
+    metar.SNOWY_ANIMATION_DURATION = duration
+
+    def run_windy(airports, data, recorder):
+        metar.animate_windy_airports(airports, data)
+
+    def run_snowy(airports, data, recorder):
+        metar.animate_snowy_airports(airports, data)
+
+    def run_lightning(airports, data, recorder):
+        metar.animate_lightning_airports(airports, data)
+
+    def run_composite(airports, data, recorder):
+        # The same per-frame path metar.py runs: Display.on_animation_frame on a DeadlineScheduler.
+        # Skipped sleeps move the scheduler's clock on, so unthrottled runs don't spin.
+        def clock():
+            return time.monotonic() + meter.skipped
+
+        display = metar.Display(DeadlineScheduler(clock=clock))
+        metar.compositor = compositor.Compositor(recorder, fps=metar.ANIMATION_FPS)
+        metar.compositor.set_scene(*metar.build_animation_scene(data))
+        scheduler = display.scheduler
+        scheduler.call_later(0, 'animation', display.on_animation_frame, retry=True)
+        end = clock() + duration
+        while clock() < end:
+            meter.sleep(min(scheduler.next_deadline(), end) - clock())
+            scheduler.run_pending()
+
+    # (name, runner, frame budget in seconds)
+    animations = [
+        ("windy", run_windy, metar.WIND_FADE_TIME / metar.NUM_STEPS),
+        ("snowy", run_snowy, 0.05),
+        ("lightning", run_lightning, 0.1),
+        ("composite", run_composite, 1.0 / metar.ANIMATION_FPS),
+    ]
+
+    mode = "real time" if throttled else "unthrottled"
+    mode += ", numpy kernels" if compositor.np is not None else ", plain Python kernels"
+    print(f"\nAnimation benchmark ({mode}, snow/composite duration {duration:.1f} s)")
+    print("-" * 104)
+    print(f"{'animation':<10} {'LEDs':>5} {'frames':>7} {'fps':>8} {'budget ms':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'missed':>7} {'CPU ms/frame':>12}")
+
+    airports_file = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+    airports_file.close()
+    try:
+        for size in sizes:
+            data = synthetic_weather(size)
+            airports = list(data)
+            with open(airports_file.name, 'w') as f:
+                f.write("\n".join(airports) + "\n")
+            metar.airport_layout = weather.AirportLayout(airports_file.name)
+            metar.NUM_PIXELS = size
+
+            for name, runner, budget in animations:
+                recorder = make_frame_recorder(size, meter)
+                metar.pixels = recorder
+                meter.slept = 0.0
+                cpu_start = time.process_time()
+                start = time.perf_counter()
+                runner(airports, data, recorder)
+                wall = time.perf_counter() - start
+                cpu = time.process_time() - cpu_start
+
+                frames = len(recorder.marks)
+                stats = frame_stats(start, recorder.marks, budget)
+                if stats is None:
+                    print(f"{name:<10} {size:>5} {0:>7}  no frames shown")
+                    continue
+                print(f"{name:<10} {size:>5} {frames:>7} {frames / wall:>8.1f} {budget * 1000:>9.1f} "
+                      f"{stats['p50'] * 1000:>8.2f} {stats['p95'] * 1000:>8.2f} {stats['p99'] * 1000:>8.2f} "
+                      f"{stats['max'] * 1000:>8.2f} {stats['missed']:>7} {cpu / frames * 1000:>12.3f}")
+    finally:
+        os.unlink(airports_file.name)
+        (metar.pixels, metar.NUM_PIXELS, metar.airport_layout, metar.SNOWY_ANIMATION_DURATION,
+         metar.time, compositor.time, compositor.np, metar.compositor) = original
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="METARMap benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    tokenizer_parser = subparsers.add_parser('tokenizer', help="Compare the METAR tokenizer with the legacy regex scans")
+    tokenizer_parser.add_argument('--count', type=int, default=4000, help="Number of synthetic observations")
+    tokenizer_parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is reported)")
+
+    animations_parser = subparsers.add_parser('animations', help="Frame rate and CPU cost of the LED animations")
+    animations_parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500, 2000], help="LED counts to test")
+    animations_parser.add_argument('--duration', type=float, default=5.0, help="Seconds to run the snow and composite animations")
+    animations_parser.add_argument('--unthrottled', action='store_true', help="Skip the animations' sleeps to find their maximum frame rate")
+    animations_parser.add_argument('--pure-python', action='store_true', help="Use the plain Python kernels even if numpy is installed")
+
+    args = parser.parse_args()
+    if args.benchmark == 'tokenizer':
+        ok = benchmark_tokenizer(args.count, args.repeat)
+        raise SystemExit(0 if ok else 1)
+    if args.benchmark == 'animations':
+        ok = benchmark_animations(args.sizes, args.duration, not args.unthrottled, args.pure_python)
+        raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
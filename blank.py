@@ -1,9 +1,7 @@
 from config import *  # Import settings from config.py
-import board
-import neopixel
+import leds
 
-pixel_pin = f"D{PIXEL_PIN}"  # Create "D18"
-pixels = neopixel.NeoPixel(getattr(board, pixel_pin), NUM_PIXELS, brightness=BRIGHTNESS, auto_write=False, pixel_order=LED_COLOR_ORDER)
+pixels = leds.create_pixels(BRIGHTNESS, NUM_PIXELS)
 
 def turn_off_leds():
     """Turn off all LEDs"""
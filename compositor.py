@@ -0,0 +1,264 @@
+"""
+METARMap animation compositor
+
+Each weather effect is a layer: a function of time that shades the pixels it
+owns. Each tick() of the compositor starts the frame from the flight category
+colors, applies all active layers in order and pushes a single frame to the
+strip, so windy, snowy and lightning airports all animate at the same time
+instead of taking turns. metar.py's display loop schedules the ticks at
+ANIMATION_FPS.
+
+When numpy is installed the per-LED work is done on arrays: snow state is held
+as start brightness, cycle and offset arrays and each layer shades all of its
+LEDs in one operation. Without numpy the same math runs in plain Python.
+"""
+
+import logging
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Plain Python kernels are used instead
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+#######------ KERNELS ------#######
+# Each kernel has a numpy and a plain Python path that give identical results.
+# Colors are truncated to ints after every step, matching int(c * level).
+
+def color_array(colors):
+    """Prepare a sequence of RGB colors for scale_colors()."""
+    if np is not None:
+        return np.array(colors, dtype=np.float64).reshape(-1, 3)
+    return [tuple(color) for color in colors]
+
+def scale_colors(colors, factor):
+    """Return every color from color_array() scaled by factor, as a list of RGB values."""
+    if np is not None and not isinstance(colors, list):
+        return np.trunc(colors * factor).astype(np.int64).tolist()
+    return [(int(r * factor), int(g * factor), int(b * factor)) for r, g, b in colors]
+
+def snow_levels(t, start_brightness, cycle_duration, start_offset, max_brightness, min_brightness):
+    """
+    Brightness of every snowy LED at time t.
+
+    Each LED fades start -> max over the first third of its cycle, max -> min
+    over the second and min -> start over the last.
+
+    Args:
+        t: Seconds since the animation started
+        start_brightness, cycle_duration, start_offset: Per-LED state (arrays or lists)
+        max_brightness, min_brightness: Brightness limits shared by all LEDs
+
+    Returns:
+        Per-LED brightness (a numpy array when the state is held in arrays)
+    """
+    if np is not None and not isinstance(start_brightness, list):
+        cycle_position = ((t - start_offset) % cycle_duration) / cycle_duration
+        return np.where(
+            cycle_position < 0.33,
+            start_brightness + (max_brightness - start_brightness) * (cycle_position / 0.33),
+            np.where(
+                cycle_position < 0.66,
+                max_brightness - (max_brightness - min_brightness) * ((cycle_position - 0.33) / 0.33),
+                min_brightness + (start_brightness - min_brightness) * ((cycle_position - 0.66) / 0.34)
+            )
+        )
+
+    levels = []
+    for start, duration, offset in zip(start_brightness, cycle_duration, start_offset):
+        cycle_position = ((t - offset) % duration) / duration
+        if cycle_position < 0.33:
+            # First third: fade from start to max
+            fade_progress = cycle_position / 0.33
+            levels.append(start + (max_brightness - start) * fade_progress)
+        elif cycle_position < 0.66:
+            # Second third: fade from max to min
+            fade_progress = (cycle_position - 0.33) / 0.33
+            levels.append(max_brightness - (max_brightness - min_brightness) * fade_progress)
+        else:
+            # Final third: fade from min back to start
+            fade_progress = (cycle_position - 0.66) / 0.34
+            levels.append(min_brightness + (start - min_brightness) * fade_progress)
+    return levels
+
+
+#######------ LAYERS ------#######
+# Layers shade a frame indexed by slot (see Compositor.set_scene). The frame is
+# a float array of shape (slots, 3) with numpy, otherwise a list of RGB tuples.
+
+def _slot_array(slots):
+    return np.array(slots, dtype=np.intp) if np is not None else list(slots)
+
+
+class WindLayer:
+    """Breathing fade: full brightness -> dim -> hold -> full brightness -> rest."""
+
+    def __init__(self, indices, brightness, dim_brightness, fade_time, pause, rest):
+        self.indices = list(indices)
+        self.slots = []
+        self.brightness = brightness
+        self.dim_brightness = dim_brightness
+        self.fade_time = max(fade_time, 0.001)
+        self.pause = pause
+        self.period = 2 * self.fade_time + pause + rest
+
+    def level(self, t):
+        """Brightness of the fade at time t (seconds since the scene started)."""
+        phase = t % self.period
+        span = self.brightness - self.dim_brightness
+        if phase < self.fade_time:
+            return self.brightness - span * (phase / self.fade_time)
+        phase -= self.fade_time
+        if phase < self.pause:
+            return self.dim_brightness
+        phase -= self.pause
+        if phase < self.fade_time:
+            return self.dim_brightness + span * (phase / self.fade_time)
+        return self.brightness
+
+    def apply(self, t, frame):
+        if not self.brightness:
+            return
+        # Colors in the frame are already at full brightness, so scale relative to it
+        factor = self.level(t) / self.brightness
+        if isinstance(frame, list):
+            for slot in self.slots:
+                r, g, b = frame[slot]
+                frame[slot] = (int(r * factor), int(g * factor), int(b * factor))
+        else:
+            frame[self.slots] = np.trunc(frame[self.slots] * factor)
+
+
+class SnowLayer:
+    """Twinkle: each LED fades start -> max -> min -> start on its own random cycle."""
+
+    def __init__(self, indices, color, max_brightness, min_brightness,
+                 cycle_min, cycle_max, start_offset_max, rng=random):
+        self.indices = list(indices)
+        self.slots = []
+        self.color = tuple(color)
+        self.max_brightness = max_brightness
+        self.min_brightness = min_brightness
+        # Per-LED state, drawn in LED order: start brightness, cycle duration, start offset
+        start_brightness, cycle_duration, start_offset = [], [], []
+        for _ in self.indices:
+            start_brightness.append(rng.uniform(min_brightness, max_brightness))
+            cycle_duration.append(rng.uniform(cycle_min, cycle_max))
+            start_offset.append(rng.uniform(0, start_offset_max))
+        if np is not None:
+            self.start_brightness = np.array(start_brightness)
+            self.cycle_duration = np.array(cycle_duration)
+            self.start_offset = np.array(start_offset)
+            self._color = np.array(self.color, dtype=np.float64)
+        else:
+            self.start_brightness = start_brightness
+            self.cycle_duration = cycle_duration
+            self.start_offset = start_offset
+
+    def levels(self, t):
+        """Brightness of every LED, in self.indices order, at time t (seconds since the scene started)."""
+        return snow_levels(t, self.start_brightness, self.cycle_duration, self.start_offset,
+                           self.max_brightness, self.min_brightness)
+
+    def colors(self, t):
+        """RGB color of every LED, in self.indices order, at time t."""
+        levels = self.levels(t)
+        if not isinstance(levels, list):
+            return np.trunc(np.outer(levels, self._color)).astype(np.int64).tolist()
+        snow_r, snow_g, snow_b = self.color
+        return [(int(snow_r * level), int(snow_g * level), int(snow_b * level)) for level in levels]
+
+    def apply(self, t, frame):
+        levels = self.levels(t)
+        if isinstance(frame, list):
+            snow_r, snow_g, snow_b = self.color
+            for slot, level in zip(self.slots, levels):
+                frame[slot] = (int(snow_r * level), int(snow_g * level), int(snow_b * level))
+        else:
+            frame[self.slots] = np.trunc(np.outer(levels, self._color))
+
+
+class LightningLayer:
+    """Flashes: flash_count short white flashes, then rest."""
+
+    FLASH_ON = 0.1
+    FLASH_OFF = 0.2
+
+    def __init__(self, indices, color, flash_count, rest):
+        self.indices = list(indices)
+        self.slots = []
+        self.color = tuple(color)
+        self.flash_time = flash_count * (self.FLASH_ON + self.FLASH_OFF)
+        self.period = self.flash_time + rest
+
+    def is_flashing(self, t):
+        phase = t % self.period
+        return phase < self.flash_time and phase % (self.FLASH_ON + self.FLASH_OFF) < self.FLASH_ON
+
+    def apply(self, t, frame):
+        if not self.is_flashing(t):
+            return
+        if isinstance(frame, list):
+            for slot in self.slots:
+                frame[slot] = self.color
+        else:
+            frame[self.slots] = self.color
+
+
+class Compositor:
+    """Blend animation layers into one frame per tick and push it to the LEDs."""
+
+    def __init__(self, pixels, fps=20):
+        self.pixels = pixels
+        self.frame_time = 1.0 / fps
+        self.base_colors = {}
+        self.layers = []
+        self._indices = []     # Slot -> LED index for every LED in the scene
+        self._base_frame = []  # Base color per slot, as an array when numpy is available
+        self.epoch = time.monotonic()
+        self.frames_rendered = 0
+
+    def set_scene(self, base_colors, layers, now=None):
+        """
+        Replace the active layers.
+
+        Args:
+            base_colors: dict of LED index -> RGB tuple the layers start from each frame
+            layers: Layers applied in order (later layers draw over earlier ones)
+            now: time.monotonic() value the layers' time starts at
+        """
+        self.base_colors = dict(base_colors)
+        self.layers = [layer for layer in layers if layer.indices]
+        # Give every LED in the scene a slot so layers can shade the frame by position
+        self._indices = sorted(self.base_colors)
+        slot_of = {index: slot for slot, index in enumerate(self._indices)}
+        self._base_frame = color_array([self.base_colors[index] for index in self._indices])
+        for layer in self.layers:
+            layer.slots = _slot_array([slot_of[index] for index in layer.indices])
+        self.epoch = time.monotonic() if now is None else now
+
+    @property
+    def active(self):
+        return bool(self.layers)
+
+    def render_colors(self, now):
+        """Return the RGB color of every scene LED, in sorted LED index order, at time.monotonic() value now."""
+        t = now - self.epoch
+        frame = self._base_frame.copy()
+        for layer in self.layers:
+            layer.apply(t, frame)
+        if isinstance(frame, list):
+            return frame
+        return frame.astype(np.int64).tolist()
+
+    def tick(self, now=None):
+        """Render one frame and push it to the strip."""
+        colors = self.render_colors(time.monotonic() if now is None else now)
+        for index, color in zip(self._indices, colors):
+            self.pixels[index] = color
+        self.pixels.show()
+        self.frames_rendered += 1
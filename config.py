@@ -9,6 +9,9 @@ NUM_PIXELS = 30
 BRIGHTNESS = 0.5
 DAYTIME_DIM_BRIGHTNESS = 0.2
 LED_COLOR_ORDER = 'RGB'
+LED_BACKEND = 'neopixel'
+LED_OUTPUT_FILE = '/tmp/metar_frames.jsonl'
+LED_GAMMA = 1.0
 WIND_THRESHOLD = 20
 WIND_FADE_TIME = 0.5
 WIND_PAUSE = 2
@@ -18,6 +21,14 @@ NUM_STEPS = 100
 LIGHTNING_FLASH_COUNT = 4
 WEATHER_UPDATE_INTERVAL = 300
 WIFI_CHECK_INTERVAL = 300
+METAR_CHUNK_SIZE = 0
+METAR_FETCH_WORKERS = 4
+STATION_TTL = 3600
+WEATHER_SNAPSHOT = False
+HISTORY_ENABLED = True
+HISTORY_RAW_DAYS = 2
+HISTORY_HOURLY_DAYS = 30
+HISTORY_MAX_MB = 50
 SNOW_BLINK_COUNT = 4
 SNOW_BLINK_PAUSE = 0.4
 SNOWY_ANIMATION_DURATION = 5.0
@@ -45,6 +56,7 @@ DAYTIME_DIMMING = True
 ENABLE_LIGHTS_OFF = False
 LEGEND = False
 ENABLE_HTTPS = True
+SETTINGS_WORKERS = 16
 UPDATE_WEATHER = True
 STALE_INDICATION = True
 WIFI_INDICATION = True
@@ -54,6 +66,8 @@ MAP_ZOOM = 8
 SELECTED_CITY = 'Denver, CO'
 USE_SUNRISE_SUNSET = True
 ANIMATION_ORDER = ["WINDY", "LIGHTNING", "SNOWY"]
+COMPOSITE_ANIMATIONS = True
+ANIMATION_FPS = 20
 
 # Legend item visibility settings
 LEGEND_VFR = True
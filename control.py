@@ -0,0 +1,143 @@
+"""
+METARMap LED control channel
+
+metar.py owns the LED strip and serves a Unix domain socket so other processes
+(the settings web app) can show test patterns, blank the map or change the
+brightness without starting a new interpreter and re-initializing the strip.
+
+Each request is one line of JSON with a "command" key; the reply is one line
+of JSON with a "success" key:
+
+    {"command": "test", "color": [255, 0, 0], "start_pixel": 0, "end_pixel": 9}
+    {"command": "off"}
+    {"command": "brightness", "value": 0.3}
+    {"command": "resume"}
+    {"command": "reload"}
+    {"command": "ping"}
+
+A brightness sent here holds until the next daytime-dimming change (or a
+config change to the brightness settings), then the configured value is back.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONTROL_SOCKET = os.environ.get('METAR_CONTROL_SOCKET', '/run/metarmap.sock')
+# Strip brightness used for test patterns (matches led_test.py)
+TEST_BRIGHTNESS = 0.1
+# Seconds a test pattern or blanked map is held before the weather display comes back
+MANUAL_MODE_TIMEOUT = 600
+
+_MAX_REQUEST = 65536
+
+
+class ControlUnavailable(Exception):
+    """Raised by send_command when no LED process is listening."""
+
+
+def send_command(command, timeout=5, socket_path=None, **params):
+    """
+    Send one command to the running LED process and return its reply.
+
+    Raises:
+        ControlUnavailable: If nothing is listening on the control socket
+        OSError: If the connection fails after it was established
+    """
+    request = dict(params, command=command)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        try:
+            client.connect(socket_path or CONTROL_SOCKET)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ControlUnavailable(str(e)) from e
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        reply = client.makefile('rb').readline()
+    if not reply:
+        return {'success': False, 'error': 'LED process closed the connection'}
+    return json.loads(reply)
+
+def is_available(socket_path=None):
+    """True if an LED process answers on the control socket."""
+    try:
+        return send_command('ping', timeout=1, socket_path=socket_path).get('success', False)
+    except (ControlUnavailable, OSError, ValueError):
+        return False
+
+def request_reload(socket_path=None):
+    """
+    Ask the running LED process to re-read config.py and airports.txt.
+
+    Returns False if it isn't listening or the reload failed, so the caller can
+    fall back to restarting metar.service.
+    """
+    try:
+        return send_command('reload', timeout=15, socket_path=socket_path).get('success', False)
+    except (ControlUnavailable, OSError, ValueError) as e:
+        logger.info(f"LED process can't reload in place ({e})")
+        return False
+
+
+
+class ControlServer:
+    """Serve the control socket from a daemon thread, passing each request to handler(request) -> reply."""
+
+    def __init__(self, handler, socket_path=None):
+        self.handler = handler
+        self.socket_path = socket_path or CONTROL_SOCKET
+        self._server = None
+
+    def start(self):
+        """Bind the socket and start serving. Returns False if the socket can't be created."""
+        try:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # Left behind by a previous run
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server.listen(4)
+        except OSError as e:
+            logger.warning(f"LED control channel unavailable ({self.socket_path}): {e}")
+            return False
+
+        self._server = server
+        threading.Thread(target=self._serve, name="led-control", daemon=True).start()
+        logger.info(f"LED control channel listening on {self.socket_path}")
+        return True
+
+    def _serve(self):
+        while self._server is not None:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return  # Closed
+            with connection:
+                try:
+                    connection.settimeout(5)
+                    line = connection.makefile('rb').readline(_MAX_REQUEST)
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                    reply = self.handler(request)
+                except ValueError as e:
+                    reply = {'success': False, 'error': f"Bad request: {e}"}
+                except Exception as e:
+                    logger.error(f"LED control command failed: {e}", exc_info=True)
+                    reply = {'success': False, 'error': str(e)}
+                try:
+                    connection.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+                except OSError:
+                    pass
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
@@ -0,0 +1,132 @@
+"""
+METARMap deadline scheduler
+
+A small heap of named events for the display loop. Each event has a deadline on
+the monotonic clock and a callback; the loop sleeps until the earliest deadline
+instead of waking on a fixed interval. Callbacks return the delay until they
+should run again, or None to run once. wake() interrupts the sleep early so
+other threads can hand the loop work.
+
+An event whose callback raises is dropped, unless it was scheduled with
+retry=True (periodic events), in which case it runs again after retry_delay.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """Run named callbacks at monotonic-clock deadlines, sleeping in between."""
+
+    def __init__(self, clock=time.monotonic, retry_delay=5):
+        self.clock = clock
+        self.retry_delay = retry_delay  # Delay before a retry=True event runs again after raising
+        self.missed = {}                # Event name -> periods skipped because the loop ran late
+        self._heap = []                 # (deadline, sequence, name)
+        self._events = {}               # Event name -> (deadline, sequence, callback, retry)
+        self._sequence = itertools.count()
+        self._wakeup = threading.Event()
+        self._incoming = []             # (name, callback, retry) handed over by other threads
+        self._incoming_lock = threading.Lock()
+
+    def call_at(self, deadline, name, callback, retry=False):
+        """
+        Schedule callback at a monotonic deadline, replacing any pending event with this name.
+        With retry=True the event runs again after retry_delay if the callback raises.
+        """
+        sequence = next(self._sequence)
+        self._events[name] = (deadline, sequence, callback, retry)
+        heapq.heappush(self._heap, (deadline, sequence, name))
+
+    def call_later(self, delay, name, callback, retry=False):
+        """Schedule callback delay seconds from now, replacing any pending event with this name."""
+        self.call_at(self.clock() + max(0.0, delay), name, callback, retry)
+
+    def call_soon_threadsafe(self, name, callback, retry=False):
+        """Run callback on the loop's thread as soon as possible. Safe to call from any thread."""
+        with self._incoming_lock:
+            self._incoming.append((name, callback, retry))
+        self._wakeup.set()
+
+    def cancel(self, name):
+        """Drop a pending event. Its stale heap entry is skipped when it comes up."""
+        self._events.pop(name, None)
+
+    def pending(self, name):
+        return name in self._events
+
+    def next_deadline(self):
+        """Earliest pending deadline, or None when nothing is scheduled."""
+        while self._heap:
+            deadline, sequence, name = self._heap[0]
+            event = self._events.get(name)
+            if event is not None and event[1] == sequence:
+                return deadline
+            heapq.heappop(self._heap)  # Cancelled or rescheduled
+        return None
+
+    def wake(self):
+        """Interrupt wait() so the loop runs again immediately. Safe to call from any thread."""
+        self._wakeup.set()
+
+    def wait(self, max_wait=None):
+        """Sleep until the earliest deadline (or max_wait). Returns True if woken by wake()."""
+        deadline = self.next_deadline()
+        timeout = max_wait
+        if deadline is not None:
+            until_deadline = max(0.0, deadline - self.clock())
+            timeout = until_deadline if timeout is None else min(timeout, until_deadline)
+        woken = self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return woken
+
+    def run_pending(self):
+        """Run every event whose deadline has passed. Returns the number of callbacks run."""
+        with self._incoming_lock:
+            incoming, self._incoming = self._incoming, []
+        for name, callback, retry in incoming:
+            self.call_at(self.clock(), name, callback, retry)
+
+        ran = 0
+        while True:
+            deadline = self.next_deadline()
+            now = self.clock()
+            if deadline is None or deadline > now:
+                return ran
+
+            _, sequence, name = heapq.heappop(self._heap)
+            _, _, callback, retry = self._events.pop(name)
+            ran += 1
+            try:
+                delay = callback()
+            except Exception as e:
+                logger.error(f"Scheduled event '{name}' failed: {e}", exc_info=True)
+                # Only periodic events come back; a one-shot event that failed is dropped
+                if retry and not self.pending(name):
+                    self.call_later(self.retry_delay, name, callback, retry)
+                continue
+
+            # Events that rescheduled themselves keep the deadline they chose
+            if delay is None or self.pending(name):
+                continue
+
+            # Step from the old deadline so periodic events don't drift, skipping
+            # whole periods that have already passed rather than running them back to back
+            next_deadline = deadline + delay
+            now = self.clock()
+            if next_deadline <= now and delay > 0:
+                skipped = int((now - next_deadline) / delay) + 1
+                self.missed[name] = self.missed.get(name, 0) + skipped
+                next_deadline += skipped * delay
+            self.call_at(max(next_deadline, now) if delay <= 0 else next_deadline, name, callback, retry)
+
+    def run_forever(self):
+        """Alternate between waiting for the next deadline and running what is due."""
+        while True:
+            self.wait()
+            self.run_pending()
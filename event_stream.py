@@ -0,0 +1,94 @@
+"""
+METARMap server-sent events
+
+EventHub fans named JSON events out to any number of open /events streams.
+A single producer publishes state snapshots (weather version, condition sets,
+service states); an event is only sent when its payload differs from the last
+one published under that name, so idle streams cost a keep-alive comment every
+HEARTBEAT_INTERVAL seconds and nothing else. New subscribers get the latest
+payload of every event straight away.
+"""
+
+import itertools
+import json
+import queue
+import threading
+
+# Seconds between keep-alive comments, which also detect disconnected clients
+HEARTBEAT_INTERVAL = 15
+# Events queued for a client that stopped reading before it is dropped
+SUBSCRIBER_BACKLOG = 32
+
+
+class TooManySubscribers(Exception):
+    """Raised by EventHub.subscribe when max_subscribers streams are already open."""
+
+
+class EventHub:
+    """Publish JSON events to SSE subscribers, skipping payloads that haven't changed."""
+
+    def __init__(self, max_subscribers=None):
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._latest = {}  # Event name -> encoded SSE message
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event, data):
+        """Send data to every subscriber unless it matches the last payload for event. Returns True if sent."""
+        payload = json.dumps(data, separators=(',', ':'), sort_keys=True)
+        with self._lock:
+            previous = self._latest.get(event)
+            if previous is not None and previous[0] == payload:
+                return False
+            message = f"id: {next(self._ids)}\nevent: {event}\ndata: {payload}\n\n".encode('utf-8')
+            self._latest[event] = (payload, message)
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            if subscriber.qsize() < SUBSCRIBER_BACKLOG:
+                subscriber.put_nowait(message)
+                continue
+            # The client isn't keeping up - end its stream, the browser reconnects and resyncs
+            self.unsubscribe(subscriber)
+            try:
+                subscriber.put_nowait(None)
+            except queue.Full:
+                pass
+        return True
+
+    def subscribe(self):
+        """Open a subscription queue primed with the latest payload of every event."""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_BACKLOG + 1)  # Room for the end-of-stream marker
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"{len(self._subscribers)} event streams already open")
+            for _, message in self._latest.values():
+                subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """End a subscription. Safe to call more than once for the same subscriber."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, subscriber, heartbeat=HEARTBEAT_INTERVAL):
+        """Yield encoded SSE messages for a subscription until it is dropped or the client goes away."""
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n".encode('utf-8')
+            while True:
+                try:
+                    message = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    message = b": keep-alive\n\n"
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
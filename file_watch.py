@@ -0,0 +1,222 @@
+"""
+METARMap file watcher
+
+Reports when a file is rewritten, using Linux inotify through ctypes so no extra
+package is needed. The file's directory is watched rather than the file itself,
+so both in-place writes (IN_CLOSE_WRITE) and atomic renames over the file
+(IN_MOVED_TO) are seen, and the watch survives the file being replaced.
+Timestamp-only changes (os.utime, IN_ATTRIB) are reported separately.
+
+Where inotify isn't available the watcher falls back to comparing the file's
+mtime and size.
+
+wait_for_change() builds debounced, content-level events on top of check():
+a burst of writes is reported once, with the SHA-1 of the file's new contents,
+and writes that leave the contents as they were are not reported at all. A
+process that writes the file itself calls expect() first so its own change is
+recognized by hash rather than by timing.
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# From <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# What check() reports
+MODIFIED = 'modified'   # The file was rewritten, replaced or removed
+TOUCHED = 'touched'     # Only the file's timestamps changed
+
+# Quiet period that ends a burst of writes, and the longest a burst can delay the event
+DEBOUNCE = 0.5
+MAX_DEBOUNCE = 5
+
+_libc = None
+
+def content_digest(content):
+    """SHA-1 hex digest of str or bytes content."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha1(content).hexdigest()
+
+def file_digest(path):
+    """SHA-1 hex digest of a file's contents, or None if it can't be read."""
+    try:
+        with open(path, 'rb') as f:
+            return content_digest(f.read())
+    except OSError:
+        return None
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+    return _libc
+
+
+class FileWatcher:
+    """Watch one file for rewrites with inotify, or by polling its mtime and size."""
+
+    def __init__(self, path, poll_interval=5):
+        self.path = os.path.abspath(path)
+        self.poll_interval = poll_interval
+        self._directory, self._name = os.path.split(self.path)
+        self._name = os.fsencode(self._name)
+        self._fd = None
+        self._closed = False
+        self._stamp = self._stat()
+        self.digest = file_digest(self.path)  # Contents last reported by wait_for_change()
+        try:
+            self._fd = self._open_inotify()
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable for {self.path} ({e}), polling every {poll_interval}s instead")
+
+    @property
+    def using_inotify(self):
+        return self._fd is not None
+
+    def fileno(self):
+        return self._fd
+
+    def _open_inotify(self):
+        libc = _get_libc()
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_ATTRIB
+        if libc.inotify_add_watch(fd, os.fsencode(self._directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, os.strerror(errno))
+        return fd
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _read_events(self):
+        """Drain queued inotify events and return the combined mask for our file."""
+        mask = 0
+        while True:
+            try:
+                buffer = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return mask
+            if not buffer:
+                return mask
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buffer):
+                _, event_mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + name_length].rstrip(b'\0')
+                offset += name_length
+                if event_mask & IN_Q_OVERFLOW or name == self._name:
+                    mask |= event_mask
+
+    def check(self, timeout=0):
+        """
+        Wait up to timeout seconds (None blocks) for a change to the file.
+
+        Returns:
+            MODIFIED if the file was rewritten, TOUCHED if only its timestamps
+            changed, or None if nothing happened
+        """
+        if self._fd is None:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                stamp = self._stat()
+                if stamp != self._stamp:
+                    # Polling can't tell a touch from a same-size rewrite, so treat both as a rewrite
+                    self._stamp = stamp
+                    return MODIFIED
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                wait = self.poll_interval if deadline is None else min(self.poll_interval, deadline - time.monotonic())
+                time.sleep(max(0.0, wait))
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if not readable:
+                return None
+            mask = self._read_events()
+            if mask:
+                break
+            # Only other files in the directory changed - keep waiting out the timeout
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+        self._stamp = self._stat()
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_Q_OVERFLOW):
+            return MODIFIED
+        return TOUCHED
+
+    def wait_for_change(self, timeout=None, debounce=DEBOUNCE):
+        """
+        Wait up to timeout seconds (None blocks) for the file's contents to change.
+
+        After the first event the watcher waits for debounce seconds without
+        another one (at most MAX_DEBOUNCE in all) before hashing the file.
+
+        Returns:
+            The new content digest, or None if nothing changed the contents
+            (timeouts, timestamp-only updates, identical rewrites and writes
+            registered with expect())
+        """
+        if self.check(timeout) is None:
+            return None
+        settle_by = time.monotonic() + MAX_DEBOUNCE
+        while time.monotonic() < settle_by and self.check(debounce) is not None:
+            pass
+
+        digest = file_digest(self.path)
+        if digest == self.digest:
+            return None
+        self.digest = digest
+        return digest
+
+    def expect(self, content):
+        """Register content this process is about to write, so the change it causes isn't reported."""
+        self.digest = content_digest(content)
+
+    def start_thread(self, callback):
+        """Call callback(kind) from a daemon thread every time the file changes."""
+        def watch():
+            while not self._closed:
+                try:
+                    kind = self.check(timeout=None)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Stopped watching {self.path}: {e}")
+                    return
+                if kind:
+                    callback(kind)
+
+        thread = threading.Thread(target=watch, name=f"watch-{os.path.basename(self.path)}", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._closed = True
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
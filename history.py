@@ -0,0 +1,254 @@
+"""
+METARMap observation history
+
+weather.json only ever holds the latest observations. HistoryStore keeps every
+observation the scheduler fetches in a small SQLite database so trends can be
+shown and a past time window can be replayed without asking the API again.
+
+Observations are keyed by (station, obs_time), so the same METAR fetched on
+every update is stored once. Full-resolution rows are kept for
+HISTORY_RAW_DAYS; after that each station keeps only its last observation of
+every hour, for HISTORY_HOURLY_DAYS. HISTORY_MAX_MB caps the file on top of
+that, so the SD card can't fill up whatever the retention settings are.
+"""
+
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = '/home/pi/history.db'
+
+# Seconds between retention passes (downsampling, expiry, size cap)
+PRUNE_INTERVAL = 3600
+# Rows handed out per fetchmany() when reading history back
+FETCH_BATCH = 500
+
+# Station fields that never change or only matter to the live map; not worth a copy per observation
+_UNSTORED_FIELDS = ('latitude', 'longitude', 'site', 'last_seen')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    station TEXT NOT NULL,
+    obs_time INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (station, obs_time)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_time ON observations (obs_time, station);
+CREATE TABLE IF NOT EXISTS hourly (
+    station TEXT NOT NULL,
+    obs_time INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (station, obs_time)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS hourly_time ON hourly (obs_time, station);
+"""
+
+
+def observation_epoch(airport_weather, default=None):
+    """
+    Epoch seconds of a station's observation_time, which the API gives as epoch
+    seconds (or, in older responses, an ISO 8601 string). Falls back to default.
+    """
+    value = airport_weather.get('observation_time')
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return default
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return int(parsed.timestamp())
+    return default
+
+
+class HistoryStore:
+    """Append-only per-station observation history in SQLite."""
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._last_prune = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        # Set before the first table is created; lets prune() hand freed pages back to the filesystem
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL with NORMAL sync: one sequential write per batch, and readers (replay) don't block the scheduler
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record(self, weather_data, fetched=None):
+        """
+        Store one fetch's station data in a single transaction. Observations
+        already stored (same station and obs_time) are skipped.
+
+        Returns:
+            int: Number of new observations stored
+        """
+        if fetched is None:
+            fetched = time.time()
+        rows = []
+        for station, airport_weather in weather_data.items():
+            if airport_weather.get('raw_observation') in (None, '', 'N/A'):
+                continue  # No report this cycle; a replay shows it as missing anyway
+            obs_time = observation_epoch(airport_weather, int(fetched))
+            data = {key: value for key, value in airport_weather.items() if key not in _UNSTORED_FIELDS}
+            rows.append((station, obs_time, json.dumps(data, separators=(',', ':'))))
+        if not rows:
+            return 0
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO observations (station, obs_time, data) VALUES (?, ?, ?)", rows)
+                added = conn.total_changes - before
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                self._prune(conn, fetched)
+                self._last_prune = time.monotonic()
+        return added
+
+    def prune(self, now=None):
+        """Apply the retention settings now rather than on the next PRUNE_INTERVAL."""
+        with self._lock:
+            self._prune(self._connection(), time.time() if now is None else now)
+            self._last_prune = time.monotonic()
+
+    def _prune(self, conn, now):
+        raw_days = getattr(config, 'HISTORY_RAW_DAYS', 2)
+        hourly_days = getattr(config, 'HISTORY_HOURLY_DAYS', 30)
+        max_bytes = getattr(config, 'HISTORY_MAX_MB', 50) * 1024 * 1024
+        raw_cutoff = int(now - raw_days * 86400)
+        hourly_cutoff = int(now - hourly_days * 86400)
+
+        with conn:
+            # Last observation of each station-hour moves to the hourly table (SQLite takes the bare
+            # columns from the MAX(obs_time) row), then the full-resolution rows are dropped
+            conn.execute("""
+                INSERT OR REPLACE INTO hourly (station, obs_time, data)
+                SELECT station, MAX(obs_time), data FROM observations
+                WHERE obs_time < ? GROUP BY station, obs_time / 3600
+            """, (raw_cutoff,))
+            downsampled = conn.execute("DELETE FROM observations WHERE obs_time < ?", (raw_cutoff,)).rowcount
+            expired = conn.execute("DELETE FROM hourly WHERE obs_time < ?", (hourly_cutoff,)).rowcount
+
+        # Size cap: drop the oldest day of history until the file fits
+        trimmed = 0
+        while self._size(conn) > max_bytes:
+            oldest = conn.execute("""
+                SELECT MIN(obs_time) FROM (SELECT MIN(obs_time) AS obs_time FROM hourly
+                                           UNION ALL SELECT MIN(obs_time) FROM observations)
+            """).fetchone()[0]
+            if oldest is None:
+                break
+            with conn:
+                for table in ('hourly', 'observations'):
+                    trimmed += conn.execute(f"DELETE FROM {table} WHERE obs_time < ?", (oldest + 86400,)).rowcount
+            self._vacuum(conn)
+
+        self._vacuum(conn)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if downsampled or expired or trimmed:
+            logger.info(f"History pruned: {downsampled} observations downsampled, {expired} hourly expired, "
+                        f"{trimmed} removed for size")
+
+    def _vacuum(self, conn):
+        # executescript runs the pragma to completion; execute() stops after freeing one page
+        conn.executescript("PRAGMA incremental_vacuum;")
+
+    def _size(self, conn):
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def _read_connection(self):
+        """A read-only connection of its own: no schema setup, and it never waits on record()'s lock."""
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10)
+
+    def span(self):
+        """(first, last) obs_time in the history, or (None, None) when it is empty."""
+        if not os.path.exists(self.path):
+            return None, None
+        conn = self._read_connection()
+        try:
+            return conn.execute("""
+                SELECT MIN(first), MAX(last) FROM (
+                    SELECT MIN(obs_time) AS first, MAX(obs_time) AS last FROM hourly
+                    UNION ALL SELECT MIN(obs_time), MAX(obs_time) FROM observations)
+            """).fetchone()
+        finally:
+            conn.close()
+
+    def iter_observations(self, start, end, stations=None, batch=FETCH_BATCH):
+        """
+        Yield (station, obs_time, station data) for observations with
+        start <= obs_time < end, oldest first, reading batch rows at a time on
+        its own connection so a long read doesn't hold up record().
+        """
+        if not os.path.exists(self.path):
+            return
+        condition = "obs_time >= ? AND obs_time < ?"
+        conn = self._read_connection()
+        try:
+            if stations is not None:
+                # A temp table rather than one IN (?, ...) placeholder per airport, which
+                # large maps can push past SQLite's bound-variable limit (999 on older builds)
+                conn.execute("CREATE TEMP TABLE wanted (station TEXT PRIMARY KEY)")
+                conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((code,) for code in stations))
+                condition += " AND station IN (SELECT station FROM wanted)"
+
+            # Everything in hourly is older than everything in observations, so reading
+            # them one after the other along the time index keeps the whole read in order
+            for table in ('hourly', 'observations'):
+                cursor = conn.execute(
+                    f"SELECT station, obs_time, data FROM {table} WHERE {condition} ORDER BY obs_time, station",
+                    (int(start), int(end)))
+                while True:
+                    rows = cursor.fetchmany(batch)
+                    if not rows:
+                        break
+                    for station, obs_time, data in rows:
+                        yield station, obs_time, json.loads(data)
+        finally:
+            conn.close()
+
+# Shared by the scheduler (writer) and anything reading history in the same process
+history_store = HistoryStore()
+
+def record_weather(weather_data, fetched=None):
+    """Add a fetch to the history if HISTORY_ENABLED, logging (not raising) on failure."""
+    if not getattr(config, 'HISTORY_ENABLED', True):
+        return 0
+    try:
+        added = history_store.record(weather_data, fetched)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to record weather history: {e}")
+        return 0
+    if added:
+        logger.info(f"Recorded {added} new observations in history")
+    return added
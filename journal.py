@@ -0,0 +1,118 @@
+"""
+METARMap service logs
+
+Reads a service's systemd journal incrementally. Every entry comes with its
+journal cursor, so a client that passes back the last cursor it saw only gets
+the entries written since, instead of the same 200 lines on every refresh.
+follow() keeps a single `journalctl -f` running for a live stream.
+
+Entries are read as JSON (-o json) and formatted like `journalctl -o short
+--no-hostname`, which is what the settings page always showed.
+"""
+
+import datetime
+import json
+import logging
+import os
+import select
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# Entries returned when there is no cursor yet (the page was just opened)
+INITIAL_LINES = 200
+# Upper bound on entries returned for one cursor, in case it is very old
+MAX_LINES = 1000
+# Seconds between keep-alive comments on a followed log
+FOLLOW_HEARTBEAT = 15
+
+
+def _journalctl(service_name, cursor=None, follow=False):
+    command = ['sudo', 'journalctl', '-u', f'{service_name}.service', '-o', 'json', '--no-pager', '--quiet']
+    if cursor:
+        command.append(f'--after-cursor={cursor}')
+    else:
+        command += ['-n', str(INITIAL_LINES)]
+    if follow:
+        command.append('--follow')
+    return command
+
+def format_entry(entry):
+    """Format one JSON journal entry like `journalctl -o short --no-hostname`."""
+    timestamp = datetime.datetime.fromtimestamp(int(entry.get('__REALTIME_TIMESTAMP', 0)) / 1e6)
+    identifier = entry.get('SYSLOG_IDENTIFIER') or entry.get('_COMM') or 'unknown'
+    pid = entry.get('_PID') or entry.get('SYSLOG_PID')
+    message = entry.get('MESSAGE')
+    if isinstance(message, list):
+        # Messages that aren't valid UTF-8 come through as a byte array
+        message = bytes(message).decode('utf-8', errors='replace')
+    elif message is None:
+        message = '[blob data]'
+    prefix = f"{identifier}[{pid}]" if pid else identifier
+    return f"{timestamp.strftime('%b %d %H:%M:%S')} {prefix}: {message}"
+
+def _parse_lines(lines):
+    """Turn journalctl -o json output lines into (formatted lines, last cursor)."""
+    formatted = []
+    cursor = None
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            logger.warning(f"Skipping unreadable journal line: {line[:80]!r}")
+            continue
+        formatted.append(format_entry(entry))
+        cursor = entry.get('__CURSOR', cursor)
+    return formatted, cursor
+
+def read_journal(service_name, cursor=None):
+    """
+    Return (lines, cursor) for a service's journal entries after cursor, or the
+    last INITIAL_LINES entries when cursor is None. cursor comes back unchanged
+    when there is nothing new.
+
+    Raises:
+        subprocess.CalledProcessError: If journalctl fails (e.g. a bad cursor)
+    """
+    result = subprocess.run(_journalctl(service_name, cursor), capture_output=True, text=True, check=True)
+    if result.stderr:
+        logger.warning(f"journalctl warning for {service_name}: {result.stderr.strip()}")
+    lines, last_cursor = _parse_lines(result.stdout.splitlines()[-MAX_LINES:])
+    return lines, last_cursor or cursor
+
+def follow(service_name, cursor=None, heartbeat=FOLLOW_HEARTBEAT):
+    """
+    Follow a service's journal with one long-running journalctl.
+
+    Yields (lines, cursor) batches as entries arrive, and (None, None) every
+    heartbeat seconds of silence so the caller can write a keep-alive and find
+    out whether its client is still there. journalctl is stopped when the
+    generator is closed.
+    """
+    process = subprocess.Popen(_journalctl(service_name, cursor, follow=True),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    fd = process.stdout.fileno()
+    pending = b''
+    try:
+        while True:
+            ready, _, _ = select.select([fd], [], [], heartbeat)
+            if not ready:
+                yield None, None
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return  # journalctl exited
+            pending += chunk
+            *complete, pending = pending.split(b'\n')
+            lines, last_cursor = _parse_lines(line.decode('utf-8', errors='replace') for line in complete)
+            if lines:
+                yield lines, last_cursor
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        process.stdout.close()
@@ -0,0 +1,287 @@
+"""
+METARMap LED output helpers
+
+The strip is created through create_pixels(), which picks an output backend:
+
+    neopixel  - the real WS281x strip via board/neopixel (default on the Pi)
+    virtual   - an in-memory strip that records every frame with a timestamp
+    file      - writes each frame as a JSON line to a file or named pipe
+
+The backend comes from the METAR_LED_BACKEND environment variable, falling back
+to LED_BACKEND in config.py, so the render path can run on any Linux box.
+"""
+
+import collections
+import json
+import logging
+import os
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('neopixel', 'virtual', 'file')
+
+
+class FrameBuffer:
+    """
+    Drop-in wrapper around a NeoPixel strip that only pushes changed frames.
+
+    Pixels are staged in memory; show() compares the staged frame (and
+    brightness) with the last one actually sent and skips the DMA transfer when
+    nothing changed. Only pixels that differ are written through to the strip.
+    """
+
+    def __init__(self, strip, num_pixels):
+        self.strip = strip
+        self.num_pixels = num_pixels
+        self._frame = [(0, 0, 0)] * num_pixels
+        self._sent_frame = None
+        self._sent_brightness = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def __len__(self):
+        return self.num_pixels
+
+    def __getitem__(self, index):
+        return self._frame[index]
+
+    def __setitem__(self, index, color):
+        self._frame[index] = tuple(color)
+
+    def fill(self, color):
+        self._frame = [tuple(color)] * self.num_pixels
+
+    @property
+    def brightness(self):
+        return self.strip.brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        self.strip.brightness = value
+
+    def show(self):
+        """Push the staged frame if it differs from the last one sent. Returns True if it was sent."""
+        brightness = self.strip.brightness
+        if self._frame == self._sent_frame and brightness == self._sent_brightness:
+            self.frames_skipped += 1
+            return False
+
+        if self._sent_frame is None:
+            for index, color in enumerate(self._frame):
+                self.strip[index] = color
+        else:
+            for index, (color, sent) in enumerate(zip(self._frame, self._sent_frame)):
+                if color != sent:
+                    self.strip[index] = color
+
+        self.strip.show()
+        self._sent_frame = list(self._frame)
+        self._sent_brightness = brightness
+        self.frames_sent += 1
+        return True
+
+    def stats(self):
+        """Return a one-line summary of sent vs. skipped frames."""
+        total = self.frames_sent + self.frames_skipped
+        skipped_pct = (self.frames_skipped / total * 100) if total else 0.0
+        return f"Frames sent: {self.frames_sent}, skipped: {self.frames_skipped} ({skipped_pct:.1f}% unchanged)"
+
+    def deinit(self):
+        """Release the strip's pin so it can be opened again (no-op for backends without one)."""
+        deinit = getattr(self.strip, 'deinit', None)
+        if deinit is not None:
+            deinit()
+
+
+class VirtualStrip:
+    """In-memory stand-in for a NeoPixel strip that records every frame shown."""
+
+    def __init__(self, num_pixels, brightness=1.0, max_frames=10000):
+        self.num_pixels = num_pixels
+        self.brightness = brightness
+        self._pixels = [(0, 0, 0)] * num_pixels
+        # (time.monotonic(), brightness, pixel tuple) for each show(), oldest dropped first
+        self.frames = collections.deque(maxlen=max_frames)
+
+    def __len__(self):
+        return self.num_pixels
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, color):
+        self._pixels[index] = tuple(color)
+
+    def fill(self, color):
+        self._pixels = [tuple(color)] * self.num_pixels
+
+    def show(self):
+        self.frames.append((time.monotonic(), self.brightness, tuple(self._pixels)))
+
+
+class FileStrip(VirtualStrip):
+    """Strip that writes each frame as a JSON line to a file or named pipe."""
+
+    def __init__(self, num_pixels, path, brightness=1.0):
+        super().__init__(num_pixels, brightness, max_frames=1)
+        self.path = path
+        # Line buffered so a reader on the other end of a pipe sees every frame
+        self._file = open(path, 'w', buffering=1)
+
+    def show(self):
+        super().show()
+        if self._file is None:
+            return
+        line = json.dumps({
+            "t": round(time.time(), 4),
+            "brightness": self.brightness,
+            "pixels": self._pixels
+        }, separators=(',', ':'))
+        try:
+            self._file.write(line + '\n')
+        except (BrokenPipeError, OSError) as e:
+            logger.error(f"LED frame output to {self.path} closed: {e}")
+            self._file = None
+
+
+def fill_range(pixels, color, start_pixel=None, end_pixel=None):
+    """
+    Set a range of LEDs to one color (all of them when no range is given).
+
+    Args:
+        pixels: Strip or FrameBuffer
+        color: RGB tuple (r, g, b)
+        start_pixel: Starting pixel index (0-based)
+        end_pixel: Ending pixel index (inclusive)
+    """
+    num_pixels = len(pixels)
+    if start_pixel is None and end_pixel is None:
+        pixels.fill(color)
+        return
+
+    # Validate pixel range
+    if start_pixel is None:
+        start_pixel = 0
+    if end_pixel is None:
+        end_pixel = num_pixels - 1
+
+    # Ensure values are within valid range
+    start_pixel = max(0, min(start_pixel, num_pixels - 1))
+    end_pixel = max(0, min(end_pixel, num_pixels - 1))
+
+    # Ensure start is less than or equal to end
+    if start_pixel > end_pixel:
+        start_pixel, end_pixel = end_pixel, start_pixel
+
+    for i in range(start_pixel, end_pixel + 1):
+        pixels[i] = color
+
+
+def get_backend(backend=None):
+    """Return the backend to use: explicit argument, then METAR_LED_BACKEND, then config."""
+    backend = backend or os.environ.get('METAR_LED_BACKEND') or getattr(config, 'LED_BACKEND', 'neopixel')
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LED backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    return backend
+
+def create_strip(num_pixels, brightness, backend=None, pixel_pin=None, pixel_order=None, output_path=None):
+    """Create the raw strip object for the selected backend."""
+    backend = get_backend(backend)
+
+    if backend == 'neopixel':
+        # Only import the hardware libraries when we actually drive hardware
+        import board
+        import neopixel
+        pixel_pin = config.PIXEL_PIN if pixel_pin is None else pixel_pin
+        pixel_order = config.LED_COLOR_ORDER if pixel_order is None else pixel_order
+        logger.info(f"Board: {board.board_id}")
+        return neopixel.NeoPixel(
+            getattr(board, f"D{pixel_pin}"),  # Create "D18"
+            num_pixels,
+            brightness=brightness,
+            auto_write=False,
+            pixel_order=pixel_order
+        )
+
+    if backend == 'file':
+        output_path = (output_path or os.environ.get('METAR_LED_OUTPUT')
+                       or getattr(config, 'LED_OUTPUT_FILE', '/tmp/metar_frames.jsonl'))
+        logger.info(f"LED frames will be written to {output_path}")
+        return FileStrip(num_pixels, output_path, brightness=brightness)
+
+    return VirtualStrip(num_pixels, brightness=brightness)
+
+def create_pixels(brightness=None, num_pixels=None, backend=None, **strip_options):
+    """Create the configured strip wrapped in a FrameBuffer."""
+    num_pixels = config.NUM_PIXELS if num_pixels is None else num_pixels
+    brightness = config.BRIGHTNESS if brightness is None else brightness
+    backend = get_backend(backend)
+    strip = create_strip(num_pixels, brightness, backend=backend, **strip_options)
+    logger.info(f"LED output backend: {backend} ({num_pixels} pixels)")
+    return FrameBuffer(strip, num_pixels)
+
+
+class Palette:
+    """
+    Precomputed RGB lookup tables: every named color at every brightness level.
+
+    Brightness is quantized to 1/LEVELS steps, so configured values like 0.5 or
+    0.05 hit their level exactly and give the same result as int(c * brightness).
+    Gamma correction is folded into the tables. The render loops only do
+    dictionary lookups; the tables are rebuilt only when the colors or gamma
+    change, since every brightness level is already covered.
+    """
+
+    LEVELS = 1000
+
+    def __init__(self, colors, gamma=1.0):
+        self.colors = {}
+        self.gamma = None
+        self._tables = []     # Brightness level -> {name: RGB tuple}
+        self._names = {}      # RGB tuple -> name, so plain colors can use the tables too
+        self.configure(colors, gamma)
+
+    def configure(self, colors, gamma=1.0):
+        """Rebuild the tables if the colors or gamma changed. Returns True if they were rebuilt."""
+        colors = {name: tuple(color) for name, color in colors.items()}
+        if colors == self.colors and gamma == self.gamma:
+            return False
+        self.colors = colors
+        self.gamma = gamma
+        self._names = {}
+        for name, color in colors.items():
+            self._names.setdefault(color, name)
+        self._tables = [
+            {name: self._scale(color, level / self.LEVELS) for name, color in colors.items()}
+            for level in range(self.LEVELS + 1)
+        ]
+        logger.info(f"Built LED palette: {len(colors)} colors x {self.LEVELS + 1} brightness levels, gamma {gamma}")
+        return True
+
+    def _scale(self, color, brightness):
+        if self.gamma == 1.0:
+            return tuple(int(c * brightness) for c in color)
+        return tuple(int(255 * ((c * brightness) / 255) ** self.gamma) for c in color)
+
+    def level(self, brightness):
+        """Quantized table index for a 0.0-1.0 brightness."""
+        return min(self.LEVELS, max(0, round(brightness * self.LEVELS)))
+
+    def at(self, brightness):
+        """Return {name: RGB tuple} for every palette color at this brightness."""
+        return self._tables[self.level(brightness)]
+
+    def color(self, name, brightness):
+        """Return one palette color at this brightness."""
+        return self._tables[self.level(brightness)][name]
+
+    def scale(self, color, brightness):
+        """Scale any RGB color, using the tables when it is one of the palette colors."""
+        name = self._names.get(tuple(color))
+        if name is not None:
+            return self._tables[self.level(brightness)][name]
+        return self._scale(color, brightness)
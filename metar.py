@@ -1,15 +1,22 @@
-import json
 import time
 import signal
 import sys
-import board
-import neopixel
 from config import *
+import config
 import weather
 import datetime
 import subprocess
 import logging
 import os
+from compositor import Compositor, WindLayer, SnowLayer, LightningLayer, color_array, scale_colors
+import leds
+from deadlines import DeadlineScheduler
+from file_watch import FileWatcher
+import control
+import itertools
+import threading
+import argparse
+import history
 import random
 
 # Configure logging with more detailed format for CLI mode
@@ -20,30 +27,65 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Settings added after the original config.py - fall back to defaults if an older config lacks them
+try:
+    COMPOSITE_ANIMATIONS
+except NameError:
+    COMPOSITE_ANIMATIONS = True
+try:
+    ANIMATION_FPS
+except NameError:
+    ANIMATION_FPS = 20
+try:
+    LED_GAMMA
+except NameError:
+    LED_GAMMA = 1.0
+
 # Global variables for WiFi checking
 last_wifi_check_time = 0
 last_wifi_status = False
 
+# How often the frame buffer's sent/skipped counters are logged
+FRAME_STATS_INTERVAL = 3600
+
 # Log startup with basic system info
 logger.info("METAR service starting up...")
 logger.info(f"Python version: {sys.version.split()[0]}")
-logger.info(f"Board: {board.board_id}")
 logger.info(f"Pixel count: {NUM_PIXELS}")
 logger.info(f"Daytime dimming: {'enabled' if DAYTIME_DIMMING else 'disabled'}")
 
 current_time = datetime.datetime.now().time()
 
+# Brightness set over the control channel as (value, is_daytime() when it was set).
+# It holds until the next bright/dim change or a reload that changes the brightness settings.
+brightness_override = None
+
+def is_daytime():
+    """True during the full-brightness hours (always, when daytime dimming is disabled)."""
+    current_time = datetime.datetime.now().time()
+    return not DAYTIME_DIMMING or BRIGHT_TIME_START <= current_time < DIM_TIME_START
+
 # Determine brightness level based on the time of day
 def get_current_brightness():
     """Determine the current brightness level based on the time."""
-    current_time = datetime.datetime.now().time()
-    if DAYTIME_DIMMING:
-        if BRIGHT_TIME_START <= current_time < DIM_TIME_START:
-            return BRIGHTNESS  # Full brightness during the day
-        else:
-            return DAYTIME_DIM_BRIGHTNESS  # Dim brightness outside of daytime hours
-    else:
-        return BRIGHTNESS  # Full brightness if daytime dimming is disabled
+    global brightness_override
+    daytime = is_daytime()
+    if brightness_override is not None:
+        value, set_in_daytime = brightness_override
+        if set_in_daytime == daytime:
+            return value
+        brightness_override = None
+        logger.info("Scheduled brightness change, dropping the brightness set over the control channel")
+
+    if daytime:
+        return BRIGHTNESS  # Full brightness during the day, or always if daytime dimming is disabled
+    return DAYTIME_DIM_BRIGHTNESS  # Dim brightness outside of daytime hours
+
+def set_brightness_override(value):
+    """Hold the strip at value until the next bright/dim change."""
+    global brightness_override
+    brightness_override = (value, is_daytime())
+    update_led_brightness(pixels)
 
 def update_led_brightness(pixels):
     """Check the time and update LED brightness if needed."""
@@ -59,19 +101,36 @@ def set_pixel_color(index, rgb_color):
     pixels[index] = rgb_color
 
 try:
-    pixel_pin = f"D{PIXEL_PIN}"  # Create "D18"
-    pixels = neopixel.NeoPixel(
-        getattr(board, pixel_pin),
-        NUM_PIXELS,
-        brightness=BRIGHTNESS,
-        auto_write=False,
-        pixel_order=LED_COLOR_ORDER
-    )
+    # The strip is wrapped so repeated show() calls with identical contents are skipped
+    pixels = leds.create_pixels(BRIGHTNESS, NUM_PIXELS)
     logger.info(f"LED strip initialized on pin D{PIXEL_PIN} with {LED_COLOR_ORDER} order")
 except Exception as e:
     logger.error(f"Failed to initialize LED strip: {e}")
     sys.exit(1)
 
+def get_palette_colors():
+    """Named colors the palette precomputes at every brightness level."""
+    return {
+        'VFR': VFR_COLOR,
+        'MVFR': MVFR_COLOR,
+        'IFR': IFR_COLOR,
+        'LIFR': LIFR_COLOR,
+        'MISSING': MISSING_COLOR,
+        'LIGHTNING': (255, 255, 255),
+        'SNOWY': SNOWY_COLOR,
+        'STALE': STALE_DATA_COLOR,
+        'WIFI': WIFI_DISCONNECTED_COLOR
+    }
+
+# Flight category and indicator colors at every brightness level, so renders are table lookups
+palette = leds.Palette(get_palette_colors(), gamma=LED_GAMMA)
+
+# LED index <-> airport mapping, shared by the render loop and the animations
+airport_layout = weather.AirportLayout(AIRPORTS_FILE)
+
+# Blends all weather animations into one frame per tick when COMPOSITE_ANIMATIONS is enabled
+compositor = Compositor(pixels, fps=ANIMATION_FPS)
+
 if DAYTIME_DIMMING:
     logger.info(f"Daytime dimming is enabled. Current brightness level: {get_current_brightness()}")
 else:
@@ -80,13 +139,11 @@ else:
 def cleanup(signal, frame):
     """Turn off all LEDs and exit."""
     logger.info("Received shutdown signal, cleaning up...")
+    logger.info(pixels.stats())
     pixels.fill((0, 0, 0))  # Turn off all LEDs
     pixels.show()
     sys.exit(0)
 
-# Attach the signal handler to SIGINT (Ctrl+C)
-signal.signal(signal.SIGINT, cleanup)
-
 def check_lights_off():
     """Check if the current time is within the lights off period."""
     current_time = datetime.datetime.now().time()
@@ -111,7 +168,7 @@ def check_lights_off():
 
 def calculate_dimmed_color(base_color, dim_brightness):
     """Calculate the dimmed color by applying the brightness factor."""
-    return tuple(int(c * dim_brightness) for c in base_color)
+    return palette.scale(base_color, dim_brightness)
 
 def get_available_leds():
     """Calculate the number of LEDs available for airports (excluding legend LEDs)."""
@@ -224,30 +281,25 @@ def update_legend(pixels):
 def animate_lightning_airports(lightning_airports, weather_data):
     """Animate the airports with detected lightning by flashing the LEDs."""
     # Scale white color by BRIGHTNESS to maintain consistent brightness
-    scaled_lightning_color = tuple(int(c * BRIGHTNESS) for c in (255, 255, 255))
+    scaled_lightning_color = palette.color('LIGHTNING', BRIGHTNESS)
+
+    # Resolve the LEDs and their flt_cat colors once, not on every flash
+    lightning_leds = []
+    for index, airport_code in airport_layout.leds_for(lightning_airports):
+        flt_cat, _, _, _ = weather.get_airport_weather(airport_code, weather_data)
+        restore_color = palette.scale(weather.get_flt_cat_color(flt_cat), BRIGHTNESS)
+        lightning_leds.append((index, restore_color))
 
     for _ in range(LIGHTNING_FLASH_COUNT):  # Flash twice
-        for index, airport_code in enumerate(weather.get_airports_with_skip(AIRPORTS_FILE)):
-            if airport_code in lightning_airports:
-                # Set LED to scaled white color for flash
-                set_pixel_color(index, scaled_lightning_color)
+        for index, _ in lightning_leds:
+            # Set LED to scaled white color for flash
+            set_pixel_color(index, scaled_lightning_color)
         pixels.show()
         time.sleep(0.1)  # Short delay for rapid flash
 
-        for index, airport_code in enumerate(weather.get_airports_with_skip(AIRPORTS_FILE)):
-            if airport_code in lightning_airports:
-                # Revert back to flt_cat color
-                flt_cat, _, _, _ = weather.get_airport_weather(airport_code, weather_data)
-                if flt_cat == 'VFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in VFR_COLOR))
-                elif flt_cat == 'MVFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in MVFR_COLOR))
-                elif flt_cat == 'IFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in IFR_COLOR))
-                elif flt_cat == 'LIFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in LIFR_COLOR))
-                else:
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in MISSING_COLOR))
+        for index, restore_color in lightning_leds:
+            # Revert back to flt_cat color
+            set_pixel_color(index, restore_color)
         pixels.show()
         time.sleep(0.2)  # Short delay before the next flash
 
@@ -255,16 +307,18 @@ def animate_lightning_airports(lightning_airports, weather_data):
 def animate_windy_airports(windy_airports, weather_data):
     """Animate the windy airports by dimming and brightening LEDs."""
     # Pre-calculate affected LEDs and their base colors to avoid lookups in the loop
-    windy_leds = []
-    for index, airport_code in enumerate(weather.get_airports_with_skip(AIRPORTS_FILE)):
-        if airport_code in windy_airports:
-            flt_cat, _, _, _ = weather.get_airport_weather(airport_code, weather_data)
-            base_color = weather.get_flt_cat_color(flt_cat)
-            windy_leds.append((index, base_color))
-
-    if not windy_leds:
+    windy_indices = []
+    base_colors = []
+    for index, airport_code in airport_layout.leds_for(windy_airports):
+        flt_cat, _, _, _ = weather.get_airport_weather(airport_code, weather_data)
+        windy_indices.append(index)
+        base_colors.append(weather.get_flt_cat_color(flt_cat))
+
+    if not windy_indices:
         return
 
+    # Held as an array when numpy is available so each step scales every LED at once
+    base_colors = color_array(base_colors)
     step_delay = WIND_FADE_TIME / NUM_STEPS  # Target delay per step
 
     # Helper for dynamic sleep
@@ -273,19 +327,16 @@ def animate_windy_airports(windy_airports, weather_data):
         if elapsed < duration:
             time.sleep(duration - elapsed)
 
+    def show_step(current_brightness):
+        for index, pixel_color in zip(windy_indices, scale_colors(base_colors, current_brightness)):
+            set_pixel_color(index, pixel_color)
+        pixels.show()
+
     # Step 1: Gradual fade to DIM_BRIGHTNESS
     for step in range(NUM_STEPS):
         loop_start = time.time()
         # Calculate brightness factor for this step
-        current_brightness = BRIGHTNESS - (BRIGHTNESS - DIM_BRIGHTNESS) * (step / NUM_STEPS)
-        
-        for index, base_color in windy_leds:
-            # Apply brightness directly
-            r, g, b = base_color
-            pixel_color = (int(r * current_brightness), int(g * current_brightness), int(b * current_brightness))
-            set_pixel_color(index, pixel_color)
-            
-        pixels.show()
+        show_step(BRIGHTNESS - (BRIGHTNESS - DIM_BRIGHTNESS) * (step / NUM_STEPS))
         dynamic_sleep(loop_start, step_delay)
 
     # Pause at DIM_BRIGHTNESS
@@ -294,115 +345,126 @@ def animate_windy_airports(windy_airports, weather_data):
     # Step 2: Gradual fade back to full BRIGHTNESS
     for step in range(NUM_STEPS):
         loop_start = time.time()
-        current_brightness = DIM_BRIGHTNESS + (BRIGHTNESS - DIM_BRIGHTNESS) * (step / NUM_STEPS)
-        
-        for index, base_color in windy_leds:
-            r, g, b = base_color
-            pixel_color = (int(r * current_brightness), int(g * current_brightness), int(b * current_brightness))
-            set_pixel_color(index, pixel_color)
-            
-        pixels.show()
+        show_step(DIM_BRIGHTNESS + (BRIGHTNESS - DIM_BRIGHTNESS) * (step / NUM_STEPS))
         dynamic_sleep(loop_start, step_delay)
 
 def animate_snowy_airports(snowy_airports, weather_data):
     """Animate the snowy airports with a realistic twinkling effect."""
-    import random
-    
     # Pre-calculate global constants for this animation frame
     # Hoist get_current_brightness out of the loop
     global_max_brightness = get_current_brightness()
-    
-    # Unpack snowy color for faster tuple construction
-    snow_r, snow_g, snow_b = SNOWY_COLOR
-    
+
     # Store original colors for restoration
     original_colors = {}
-    airport_list = weather.get_airports_with_skip(AIRPORTS_FILE)
-    
+
     # Pre-calculate the list of snowy LED indices to avoid iterating the full airport list
     snowy_indices = []
-    
-    for index, airport_code in enumerate(airport_list):
-        if airport_code in snowy_airports:
-            flt_cat, _, _, _ = weather.get_airport_weather(airport_code, weather_data)
-            base_color = weather.get_flt_cat_color(flt_cat)
-            original_colors[index] = tuple(int(c * BRIGHTNESS) for c in base_color)
-            snowy_indices.append(index)
-            
+
+    for index, airport_code in airport_layout.leds_for(snowy_airports):
+        flt_cat, _, _, _ = weather.get_airport_weather(airport_code, weather_data)
+        base_color = weather.get_flt_cat_color(flt_cat)
+        original_colors[index] = palette.scale(base_color, BRIGHTNESS)
+        snowy_indices.append(index)
+
     if not snowy_indices:
         return
-    
-    # Track LED states for each snowy airport
-    led_states = {}  # index -> {'start_brightness': float, 'cycle_duration': float, 'start_time': float}
+
+    # Per-LED start brightness, cycle duration and start offset, held as arrays when numpy
+    # is available. current_brightness is already scaled relative to global brightness,
+    # so SNOWY_COLOR is not multiplied by BRIGHTNESS again.
+    twinkle = SnowLayer(
+        snowy_indices,
+        SNOWY_COLOR,
+        global_max_brightness,
+        SNOW_MIN_BRIGHTNESS,
+        SNOW_CYCLE_MIN_DURATION,
+        SNOW_CYCLE_MAX_DURATION,
+        SNOW_START_OFFSET_MAX
+    )
     start_time = time.time()
-    
-    # Initialize random states for each LED
-    for index in snowy_indices:
-        led_states[index] = {
-            'start_brightness': random.uniform(SNOW_MIN_BRIGHTNESS, global_max_brightness),
-            'cycle_duration': random.uniform(SNOW_CYCLE_MIN_DURATION, SNOW_CYCLE_MAX_DURATION),
-            'start_time': start_time + random.uniform(0, SNOW_START_OFFSET_MAX)
-        }
-    
+
     # Twinkling animation loop
     end_time = start_time + SNOWY_ANIMATION_DURATION
     target_frame_time = 0.05 # 20 FPS
-    
+
     while True:
         loop_start = time.time()
         if loop_start >= end_time:
             break
-            
-        # Update LED colors based on fade cycle
-        for index in snowy_indices:
-            state = led_states[index]
-            
-            # Calculate time since this LED's cycle started
-            cycle_time = (loop_start - state['start_time']) % state['cycle_duration']
-            
-            # Calculate position in cycle (0.0 to 1.0)
-            cycle_position = cycle_time / state['cycle_duration']
-            
-            # Create fade cycle: start → max → min → start
-            # Use the pre-calculated global_max_brightness
-            if cycle_position < 0.33:
-                # First third: fade from start to max
-                fade_progress = cycle_position / 0.33  # 0.0 to 1.0
-                current_brightness = state['start_brightness'] + (global_max_brightness - state['start_brightness']) * fade_progress
-            elif cycle_position < 0.66:
-                # Second third: fade from max to min
-                fade_progress = (cycle_position - 0.33) / 0.33  # 0.0 to 1.0
-                current_brightness = global_max_brightness - (global_max_brightness - SNOW_MIN_BRIGHTNESS) * fade_progress
-            else:
-                # Final third: fade from min back to start
-                fade_progress = (cycle_position - 0.66) / 0.34  # 0.0 to 1.0
-                current_brightness = SNOW_MIN_BRIGHTNESS + (state['start_brightness'] - SNOW_MIN_BRIGHTNESS) * fade_progress
-            
-            # Apply brightness to snowy color
-            # FIX: Do NOT multiply by BRIGHTNESS again. current_brightness is already scaled relative to global brightness.
-            # Optimized: Direct tuple construction instead of generator
-            color = (int(snow_r * current_brightness), int(snow_g * current_brightness), int(snow_b * current_brightness))
+
+        # Fade cycle start -> max -> min -> start for every LED in one pass
+        for index, color in zip(snowy_indices, twinkle.colors(loop_start - start_time)):
             set_pixel_color(index, color)
-        
+
         # Update display
         pixels.show()
-        
+
         # Dynamic sleep to maintain frame rate
         elapsed = time.time() - loop_start
         if elapsed < target_frame_time:
             time.sleep(target_frame_time - elapsed)
-    
+
     # Restore original flight category colors
     for index, original_color in original_colors.items():
         set_pixel_color(index, original_color)
     pixels.show()
 
 
+def build_animation_scene(weather_data, rng=random):
+    """Build the compositor base colors and layers for every enabled animation.
+
+    Layers are applied snow -> wind -> lightning, so a windy and snowy airport
+    twinkles while it breathes and lightning always flashes on top. rng draws the
+    snow twinkle pattern; wind and lightning timing has no randomness.
+    """
+    base_colors = {}
+
+    def layer_indices(airports):
+        indices = []
+        for index, airport_code in airport_layout.leds_for(airports):
+            if index not in base_colors:
+                flt_cat, _, _, _ = weather.get_airport_weather(airport_code, weather_data)
+                base_colors[index] = palette.scale(weather.get_flt_cat_color(flt_cat), BRIGHTNESS)
+            indices.append(index)
+        return indices
+
+    layers = []
+    if SNOWY_ANIMATION:
+        layers.append(SnowLayer(
+            layer_indices(weather.get_snowy_airports(weather_data)),
+            SNOWY_COLOR,
+            get_current_brightness(),
+            SNOW_MIN_BRIGHTNESS,
+            SNOW_CYCLE_MIN_DURATION,
+            SNOW_CYCLE_MAX_DURATION,
+            SNOW_START_OFFSET_MAX,
+            rng=rng
+        ))
+    if WIND_ANIMATION:
+        layers.append(WindLayer(
+            layer_indices(weather.get_windy_airports(weather_data)),
+            BRIGHTNESS,
+            DIM_BRIGHTNESS,
+            WIND_FADE_TIME,
+            WIND_PAUSE,
+            ANIMATION_PAUSE
+        ))
+    if LIGHTENING_ANIMATION:
+        layers.append(LightningLayer(
+            layer_indices(weather.get_lightning_airports(weather_data)),
+            palette.color('LIGHTNING', BRIGHTNESS),
+            LIGHTNING_FLASH_COUNT,
+            ANIMATION_PAUSE
+        ))
+
+    return base_colors, layers
+
+
 #from config import BRIGHTNESS  # Import BRIGHTNESS from config.py
 
 def is_weather_stale():
     try:
-        weather_file_time = os.path.getmtime('weather.json')
+        weather_file_time = os.path.getmtime(weather.WEATHER_FILE)
         current_time = time.time()
         time_since_update = current_time - weather_file_time
         stale_threshold = WEATHER_UPDATE_INTERVAL * 2
@@ -476,8 +538,14 @@ def update_leds(weather_data):
         logger.info("Lights are off, returning early")
         return
 
-    # Get list of airports, including "SKIP" entries first
-    airport_list = weather.get_airports_with_skip(AIRPORTS_FILE)
+    # Get list of airports, including "SKIP" entries first. The layout only touches
+    # the disk here, once per display cycle, and only re-reads the file if it changed.
+    airport_layout.refresh()
+    airport_list = airport_layout.airports
+
+    # Every color this render needs at the current brightness; rebuilt only if the colors changed
+    palette.configure(get_palette_colors(), gamma=LED_GAMMA)
+    colors = palette.at(BRIGHTNESS)
     logger.info(f"Airport list: {airport_list}")
 
     # Determine how many LEDs are available for airports
@@ -494,7 +562,7 @@ def update_leds(weather_data):
             if airport_code == "SKIP":
                 set_pixel_color(index, (0, 0, 0))  # Keep SKIP LEDs off
             else:
-                set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in WIFI_DISCONNECTED_COLOR))
+                set_pixel_color(index, colors['WIFI'])
         pixels.show()
         logger.warning("WiFi disconnected - displaying warning color")
         return
@@ -508,7 +576,7 @@ def update_leds(weather_data):
             if airport_code == "SKIP":
                 set_pixel_color(index, (0, 0, 0))  # Keep SKIP LEDs off
             else:
-                set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in STALE_DATA_COLOR))
+                set_pixel_color(index, colors['STALE'])
         pixels.show()
         logger.warning("Weather data is stale - displaying warning color")
         return
@@ -556,16 +624,10 @@ def update_leds(weather_data):
             else:
                 flt_cat, wind_speed, wind_gust, lightning = weather.get_airport_weather(airport_code, weather_data)
 #                logger.info(f"Airport {airport_code}: {flt_cat}")
-                if flt_cat == 'VFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in VFR_COLOR))
-                elif flt_cat == 'MVFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in MVFR_COLOR))
-                elif flt_cat == 'IFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in IFR_COLOR))
-                elif flt_cat == 'LIFR':
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in LIFR_COLOR))
+                if flt_cat in ('VFR', 'MVFR', 'IFR', 'LIFR'):
+                    set_pixel_color(index, colors[flt_cat])
                 else:
-                    set_pixel_color(index, tuple(int(c * BRIGHTNESS) for c in MISSING_COLOR))
+                    set_pixel_color(index, colors['MISSING'])
                     logger.warning(f"Missing flight category data for {airport_code}")
 
         pixels.show()
@@ -575,96 +637,502 @@ def update_leds(weather_data):
         import traceback
         logger.error(f"Full traceback: {traceback.format_exc()}")
 
-def handle_kiosk_timeout():
-    """Handle kiosk mode timeout by restoring normal operation."""
-    logger.info("Kiosk mode timeout - restoring normal operation")
-    if weather.restore_airports_file():
-        logger.info("Successfully restored airports file from backup")
-        # Force a weather update
-        weather_data = weather.fetch_metar()
-        if weather_data:
-            parsed_data = weather.parse_weather(weather_data)
-            with open('weather.json', 'w') as json_file:
-                json.dump(parsed_data, json_file, indent=4)
-            return True
-    else:
-        logger.error("Failed to restore normal operation")
-        return False
-
-def update_kiosk_airports(airport_codes):
-    """Update airports for kiosk mode."""
-    logger.info(f"Updating kiosk airports: {airport_codes}")
-    if weather.update_airports_file(airport_codes):
-        logger.info("Successfully updated airports file")
-        # Force a weather update
-        weather_data = weather.fetch_metar()
-        if weather_data:
-            parsed_data = weather.parse_weather(weather_data)
-            with open('weather.json', 'w') as json_file:
-                json.dump(parsed_data, json_file, indent=4)
-            return True
-    else:
-        logger.error("Failed to update kiosk airports")
-        return False
-
-# Main loop
-previous_lights_off = False  # Track previous state
-logger.info("Starting main loop...")
-logger.info(f"ENABLE_LIGHTS_OFF: {ENABLE_LIGHTS_OFF}")
-logger.info(f"LIGHTS_ON_TIME: {LIGHTS_ON_TIME}")
-logger.info(f"LIGHTS_OFF_TIME: {LIGHTS_OFF_TIME}")
-logger.info(f"Current time: {datetime.datetime.now().time()}")
-
-while True:
-    try:
-        # Check if the lights should be off based on current time
-        lights_off = check_lights_off()
+#######------ DISPLAY LOOP ------#######
+
+# Longest the loop sleeps before re-checking a wall-clock boundary (lights on/off,
+# brightness). The Pi has no RTC, so the clock can jump when NTP syncs after boot.
+WALL_CLOCK_RECHECK = 300
+# How often weather.json is checked for a new write when inotify isn't available
+WEATHER_FILE_CHECK_INTERVAL = 5
+
+# Settings that can only take effect by re-opening the strip
+STRIP_SETTINGS = ('PIXEL_PIN', 'NUM_PIXELS', 'LED_COLOR_ORDER', 'LED_BACKEND')
+# Settings that replace a brightness set over the control channel when they change
+BRIGHTNESS_SETTINGS = ('BRIGHTNESS', 'DAYTIME_DIM_BRIGHTNESS', 'DAYTIME_DIMMING')
+
+def reload_config():
+    """
+    Re-read config.py and airports.txt and rebuild everything derived from them
+    (palette, LED layout, animation frame rate). The strip is only re-opened when
+    one of STRIP_SETTINGS changed.
+    """
+    global pixels, airport_layout, brightness_override
+    strip_before = [globals().get(name) for name in STRIP_SETTINGS]
+    brightness_before = [globals().get(name) for name in BRIGHTNESS_SETTINGS]
+    weather.reload_config()  # Reloads the config module and weather.py's copy of it
+    globals().update({name: value for name, value in vars(config).items() if name.isupper()})
+    if [globals().get(name) for name in BRIGHTNESS_SETTINGS] != brightness_before:
+        brightness_override = None
+
+    if [globals().get(name) for name in STRIP_SETTINGS] != strip_before:
+        logger.info(f"LED strip settings changed, re-opening the strip on pin D{PIXEL_PIN} with {NUM_PIXELS} pixels")
+        pixels.fill((0, 0, 0))
+        pixels.show()
+        pixels.deinit()
+        try:
+            pixels = leds.create_pixels(get_current_brightness(), NUM_PIXELS)
+        except Exception as e:
+            logger.error(f"Failed to initialize LED strip: {e}")
+            sys.exit(1)  # Let systemd restart the service with the new settings
+        compositor.pixels = pixels
+
+    palette.configure(get_palette_colors(), LED_GAMMA)
+    airport_layout = weather.AirportLayout(AIRPORTS_FILE)
+    compositor.frame_time = 1.0 / ANIMATION_FPS
+
+def seconds_until(time_of_day):
+    """Seconds from now until the next occurrence of a datetime.time."""
+    now = datetime.datetime.now()
+    target = datetime.datetime.combine(now.date(), time_of_day)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+def animations_allowed():
+    """Animations only run on good data: not stale and WiFi up (when those indications are enabled)."""
+    return not (STALE_INDICATION and is_weather_stale()) and not (WIFI_INDICATION and not check_wifi_status())
+
+
+class Display:
+    """
+    Event-driven display loop.
+
+    Every reason to touch the LEDs is a scheduler event: lights on/off and
+    brightness boundaries, a new weather.json, the data going stale, a WiFi
+    change, animation frames and the periodic frame stats. Between events the
+    process sleeps until the earliest deadline.
+    """
+
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler or DeadlineScheduler()
+        self.weather_data = None
+        self.weather_version = None  # weather.weather_cache.version last drawn
+        self.weather_stale = None
+        self.weather_watcher = None
+        self.lights_off = None
+        self.wifi_connected = None
+        self.manual = False  # A test pattern or blank from the control channel is on the strip
+        self.control_server = control.ControlServer(self.handle_control)
+        self._control_ids = itertools.count()
+        self.rng = random  # Draws the animation scenes' random patterns
+
+    def start(self):
+        logger.info("Starting main loop...")
+        logger.info(f"ENABLE_LIGHTS_OFF: {ENABLE_LIGHTS_OFF}")
+        logger.info(f"LIGHTS_ON_TIME: {LIGHTS_ON_TIME}")
+        logger.info(f"LIGHTS_OFF_TIME: {LIGHTS_OFF_TIME}")
+        logger.info(f"Current time: {datetime.datetime.now().time()}")
+
+        # weather.json writes wake the loop through inotify; without it the file is polled
+        self.weather_watcher = FileWatcher(weather.WEATHER_FILE, poll_interval=WEATHER_FILE_CHECK_INTERVAL)
+        if self.weather_watcher.using_inotify:
+            self.weather_watcher.start_thread(
+                lambda kind: self.scheduler.call_soon_threadsafe('weather', self.on_weather_check, retry=True))
+
+        self.control_server.start()
+
+        schedule = self.scheduler.call_later
+        schedule(0, 'weather', self.on_weather_check, retry=True)
+        schedule(0, 'lights', self.on_lights, retry=True)
+        if DAYTIME_DIMMING:
+            schedule(0, 'brightness', self.on_brightness, retry=True)
+        if WIFI_INDICATION:
+            schedule(WIFI_CHECK_INTERVAL, 'wifi', self.on_wifi_check, retry=True)
+        schedule(FRAME_STATS_INTERVAL, 'frame_stats', self.on_frame_stats, retry=True)
+
+    def run(self):
+        self.start()
+        self.scheduler.run_forever()
+
+    #######------ RENDERING ------#######
+
+    def refresh(self):
+        """Redraw the map from the current weather data and rebuild the animations."""
+        if self.manual:
+            return  # Leave the control channel's pattern alone until it resumes or times out
+        self.lights_off = check_lights_off()  # Blanks the strip when the lights are off
+        if self.lights_off:
+            self.stop_animations()
+            return
+
+        if self.weather_data is None:
+            self.load_weather()
+        if self.weather_data is None:
+            return
+
+        # Update LEDs - this will handle WiFi and stale data states
+        update_leds(self.weather_data)
+        update_led_brightness(pixels)
+        pixels.show()  # Ensure LEDs are updated
+        if LEGEND:
+            update_legend(pixels)
+        self.start_animations()
+
+    def load_weather(self):
+        """Pick up the shared weather data. Returns True if it changed since it was last drawn."""
+        self.weather_data = weather.read_weather_data()
+        version = weather.weather_cache.version
+        changed = version != self.weather_version
+        self.weather_version = version
+        return changed
+
+    def stop_animations(self):
+        compositor.set_scene({}, [])
+        self.scheduler.cancel('animation')
+
+    def start_animations(self):
+        """Schedule the animations for the current weather, or stop them if they shouldn't run."""
+        if not animations_allowed():
+            self.stop_animations()
+            return
+
+        if COMPOSITE_ANIMATIONS:
+            compositor.set_scene(*build_animation_scene(self.weather_data, self.rng))
+            if compositor.active:
+                self.scheduler.call_later(0, 'animation', self.on_animation_frame, retry=True)
+            else:
+                self.scheduler.cancel('animation')
+            return
+
+        conditions = ((WIND_ANIMATION, weather.get_windy_airports),
+                      (LIGHTENING_ANIMATION, weather.get_lightning_airports),
+                      (SNOWY_ANIMATION, weather.get_snowy_airports))
+        if any(enabled and get_airports(self.weather_data) for enabled, get_airports in conditions):
+            self.scheduler.call_later(ANIMATION_PAUSE, 'animation', self.on_animation_cycle)
+        else:
+            self.scheduler.cancel('animation')
+
+    def reload(self):
+        """Apply a changed config.py or airports.txt without restarting the service."""
+        logger.info("Reloading configuration...")
+        self.stop_animations()
+        reload_config()
+
+        # Lights, dimming and WiFi settings may have changed, so re-arm their events
+        schedule = self.scheduler.call_later
+        schedule(0, 'weather', self.on_weather_check, retry=True)
+        schedule(0, 'lights', self.on_lights, retry=True)
+        if DAYTIME_DIMMING:
+            schedule(0, 'brightness', self.on_brightness, retry=True)
+        else:
+            self.scheduler.cancel('brightness')
+        if WIFI_INDICATION:
+            schedule(0, 'wifi', self.on_wifi_check, retry=True)
+        else:
+            self.scheduler.cancel('wifi')
+            self.wifi_connected = None
 
-        # Only log when state changes from on to off
-        if lights_off and not previous_lights_off:
-            logger.info("Lights turned off - outside operational hours")
-        elif not lights_off and previous_lights_off:
-            logger.info("Lights turned on - within operational hours")
+        self.refresh()
+        logger.info("Configuration reloaded")
 
-        previous_lights_off = lights_off  # Update previous state
+    def request_reload(self, signum=None, frame=None):
+        """SIGHUP handler: queue a reload on the display loop's thread."""
+        # The signal can arrive while the loop holds the scheduler's locks, so hand
+        # the reload over from a separate thread rather than from the handler itself
+        threading.Thread(target=self.scheduler.call_soon_threadsafe, args=('reload', self.reload),
+                         daemon=True).start()
 
-        if not lights_off:
-            # Read the weather data and update the LEDs if lights are on
-            weather_data = weather.read_weather_data()
-            if weather_data is None:
-                logger.error("Failed to read weather data")
-                time.sleep(5)  # Wait before retry
-                continue
+    #######------ EVENTS ------#######
 
-            # Update LEDs - this will handle WiFi and stale data states
-            update_leds(weather_data)
-            update_led_brightness(pixels)
-            pixels.show()  # Ensure LEDs are updated
-            if LEGEND:
-                update_legend(pixels)
-
-            time.sleep(ANIMATION_PAUSE)
-
-            # Only run animations if we have good data and at least one airport needs animation
-            if not (STALE_INDICATION and is_weather_stale()) and not (WIFI_INDICATION and not check_wifi_status()):
-                windy = weather.get_windy_airports(weather_data)
-                lightning = weather.get_lightning_airports(weather_data)
-                snowy = weather.get_snowy_airports(weather_data)
-
-                for animation_name in ANIMATION_ORDER:
-                    if animation_name == "WINDY" and WIND_ANIMATION and windy:
-                        animate_windy_airports(windy, weather_data)
-                    elif animation_name == "LIGHTNING" and LIGHTENING_ANIMATION and lightning:
-                        animate_lightning_airports(lightning, weather_data)
-                    elif animation_name == "SNOWY" and SNOWY_ANIMATION and snowy:
-                        animate_snowy_airports(snowy, weather_data)
+    def on_weather_check(self):
+        """Redraw when weather.json has new data, and re-arm the staleness deadline."""
+        changed = self.load_weather()
+
+        try:
+            stale_in = os.path.getmtime(weather.WEATHER_FILE) + WEATHER_UPDATE_INTERVAL * 2 - time.time()
+        except OSError:
+            stale_in = 0
+        was_stale, self.weather_stale = self.weather_stale, stale_in <= 0
+        if STALE_INDICATION and stale_in > 0:
+            # Redraw the moment the file becomes stale rather than on the next check
+            self.scheduler.call_later(stale_in + 1, 'stale', self.on_stale)
         else:
-            # If lights should be off, ensure LEDs are off and sleep
+            self.scheduler.cancel('stale')
+
+        # A timestamp-only refresh (HTTP 304) can make stale data current again
+        if changed or was_stale != self.weather_stale:
+            self.refresh()
+        return None if self.weather_watcher.using_inotify else WEATHER_FILE_CHECK_INTERVAL
+
+    def on_stale(self):
+        logger.info("Weather data reached its staleness deadline")
+        self.weather_stale = True
+        self.refresh()
+
+    def on_lights(self):
+        lights_off = check_lights_off()
+        if lights_off != self.lights_off:
+            if self.lights_off is not None:
+                if lights_off:
+                    logger.info("Lights turned off - outside operational hours")
+                else:
+                    logger.info("Lights turned on - within operational hours")
+            self.refresh()
+
+        if not ENABLE_LIGHTS_OFF:
+            return None
+        return min(seconds_until(LIGHTS_ON_TIME), seconds_until(LIGHTS_OFF_TIME), WALL_CLOCK_RECHECK) + 0.5
+
+    def on_brightness(self):
+        if not self.lights_off and not self.manual:
+            update_led_brightness(pixels)
+        return min(seconds_until(BRIGHT_TIME_START), seconds_until(DIM_TIME_START), WALL_CLOCK_RECHECK) + 0.5
+
+    def on_wifi_check(self):
+        connected = check_wifi_status()
+        if connected != self.wifi_connected:
+            if self.wifi_connected is not None:
+                self.refresh()
+            self.wifi_connected = connected
+        return WIFI_CHECK_INTERVAL
+
+    def on_animation_frame(self):
+        compositor.tick()
+        return compositor.frame_time
+
+    def on_animation_cycle(self):
+        """Run the sequential animations in ANIMATION_ORDER, then redraw and wait ANIMATION_PAUSE again."""
+        windy = weather.get_windy_airports(self.weather_data)
+        lightning = weather.get_lightning_airports(self.weather_data)
+        snowy = weather.get_snowy_airports(self.weather_data)
+
+        for animation_name in ANIMATION_ORDER:
+            if animation_name == "WINDY" and WIND_ANIMATION and windy:
+                animate_windy_airports(windy, self.weather_data)
+            elif animation_name == "LIGHTNING" and LIGHTENING_ANIMATION and lightning:
+                animate_lightning_airports(lightning, self.weather_data)
+            elif animation_name == "SNOWY" and SNOWY_ANIMATION and snowy:
+                animate_snowy_airports(snowy, self.weather_data)
+        self.refresh()
+
+    #######------ CONTROL CHANNEL ------#######
+
+    def handle_control(self, request):
+        """Run a control request on the display loop's thread and return its reply (control server thread)."""
+        done = threading.Event()
+        reply = {}
+
+        def run():
+            try:
+                reply.update(self.apply_control(request))
+            except Exception as e:
+                logger.error(f"LED control command failed: {e}", exc_info=True)
+                reply.update(success=False, error=str(e))
+            done.set()
+
+        self.scheduler.call_soon_threadsafe(f"control-{next(self._control_ids)}", run)
+        if not done.wait(10):
+            return {'success': False, 'error': 'LED display is busy, try again'}
+        return reply
+
+    def apply_control(self, request):
+        command = request.get('command')
+        if command == 'ping':
+            return {'success': True, 'manual': self.manual}
+
+        if command == 'test':
+            color = tuple(int(c) for c in request['color'])
+            self.enter_manual_mode()
+            pixels.brightness = float(request.get('brightness', control.TEST_BRIGHTNESS))
             pixels.fill((0, 0, 0))
+            leds.fill_range(pixels, color, request.get('start_pixel'), request.get('end_pixel'))
             pixels.show()
-            time.sleep(10)  # Sleep longer when lights are off to reduce CPU usage
-    except Exception as e:
-        logger.error(f"Error in main loop: {str(e)}")
-        import traceback
-        logger.error(f"Full traceback: {traceback.format_exc()}")
-        time.sleep(5)  # Wait before retrying
+            return {'success': True}
+
+        if command == 'off':
+            self.enter_manual_mode()
+            pixels.fill((0, 0, 0))
+            pixels.show()
+            return {'success': True}
+
+        if command == 'brightness':
+            # An override, so on_brightness and later redraws keep it instead of the config value
+            set_brightness_override(float(request['value']))
+            logger.info(f"Brightness set to {pixels.brightness:.2f} over the control channel")
+            return {'success': True}
+
+        if command == 'resume':
+            self.leave_manual_mode()
+            return {'success': True}
+
+        if command == 'reload':
+            self.reload()
+            return {'success': True}
+
+        return {'success': False, 'error': f"Unknown command: {command}"}
+
+    def enter_manual_mode(self):
+        if not self.manual:
+            logger.info("Control channel took over the LEDs")
+        self.manual = True
+        self.stop_animations()
+        # Don't leave the map dark forever if the settings page never sends resume
+        self.scheduler.call_later(control.MANUAL_MODE_TIMEOUT, 'manual_timeout', self.leave_manual_mode)
+
+    def leave_manual_mode(self):
+        self.scheduler.cancel('manual_timeout')
+        if not self.manual:
+            return
+        logger.info("Control channel released the LEDs, resuming the weather display")
+        self.manual = False
+        update_led_brightness(pixels)
+        self.refresh()
+
+    def on_frame_stats(self):
+        logger.info(pixels.stats())
+        missed = self.scheduler.missed.get('animation', 0)
+        if missed:
+            logger.info(f"Animation frames dropped while running late: {missed}")
+        return FRAME_STATS_INTERVAL
+
+
+#######------ REPLAY ------#######
+
+# Settings that don't apply to recorded weather: it is always "stale", the
+# WiFi state is irrelevant, and a replay is started by hand so it should show
+REPLAY_OVERRIDES = {'STALE_INDICATION': False, 'WIFI_INDICATION': False, 'ENABLE_LIGHTS_OFF': False}
+# Real seconds between replay steps; each one moves the replay REPLAY_STEP * speed seconds on
+REPLAY_STEP = 0.5
+# A station with no newer observation than this (in replayed time) shows as missing
+REPLAY_STATION_AGE = 2 * 3600
+
+def parse_replay_time(value):
+    """argparse type for --replay: an ISO date/time, local time unless it carries an offset."""
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a date/time: {value!r} (use e.g. 2025-06-01T14:00)")
+    return moment.timestamp()
+
+
+class ReplayDisplay(Display):
+    """
+    Plays recorded observations from the history database through the normal
+    render path, speed times faster than real time. Rows are read from disk as
+    the replay reaches them; nothing is fetched from the API and weather.json,
+    the control channel and the WiFi/stale checks are left alone.
+
+    The replayed time moves on a fixed amount per step rather than following
+    the wall clock, and the animations draw from a generator seeded with seed,
+    so the same replay shows the same thing on every run however late the
+    loop wakes.
+    """
+
+    def __init__(self, start, end, speed=60.0, loop=False, seed=0, store=None, scheduler=None):
+        super().__init__(scheduler)
+        self.start_time = start
+        self.end_time = end
+        self.speed = speed
+        self.loop = loop
+        self.seed = seed
+        self.store = store or history.history_store
+        self.stations = {}  # Airport code -> last replayed observation
+        self.rows = None
+        self.next_row = None
+        self.replay_time = None  # Replayed epoch time of the next step
+
+    def start(self):
+        globals().update(REPLAY_OVERRIDES)
+        airports = [code for code in airport_layout.airports if code != "SKIP"]
+        first, last = self.store.span()
+        if first is None:
+            logger.error(f"No recorded observations in {self.store.path}")
+            sys.exit(1)
+        logger.info(f"Replaying {self.describe(self.start_time)} to {self.describe(self.end_time)} at "
+                    f"{self.speed:g}x for {len(airports)} airports (history covers "
+                    f"{self.describe(first)} to {self.describe(last)})")
+        self.rewind(airports)
+
+        schedule = self.scheduler.call_later
+        schedule(0, 'replay', self.on_replay_step, retry=True)
+        schedule(0, 'lights', self.on_lights, retry=True)
+        if DAYTIME_DIMMING:
+            schedule(0, 'brightness', self.on_brightness, retry=True)
+        schedule(FRAME_STATS_INTERVAL, 'frame_stats', self.on_frame_stats, retry=True)
+
+    @staticmethod
+    def describe(epoch):
+        return datetime.datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M')
+
+    def rewind(self, airports=None):
+        """Start over at start_time, seeded with each station's last observation before it."""
+        if airports is None:
+            airports = list(self.stations) or [code for code in airport_layout.airports if code != "SKIP"]
+        self.stations = {}
+        for station, obs_time, data in self.store.iter_observations(
+                self.start_time - REPLAY_STATION_AGE, self.start_time, airports):
+            self.stations[station] = data
+        if self.rows is not None:
+            self.rows.close()
+        self.rows = self.store.iter_observations(self.start_time, self.end_time, airports)
+        self.next_row = next(self.rows, None)
+        self.replay_time = self.start_time
+        self.rng = random.Random(self.seed)  # Every pass of a looped replay twinkles alike
+
+    def load_weather(self):
+        return False  # weather_data only changes on replay steps
+
+    def on_replay_step(self):
+        """Apply every observation up to the replayed time, redraw, and move the replay one step on."""
+        replay_time = self.replay_time
+        applied = 0
+        while self.next_row is not None and self.next_row[1] <= replay_time:
+            station, obs_time, data = self.next_row
+            self.stations[station] = data
+            applied += 1
+            self.next_row = next(self.rows, None)
+
+        if applied or self.weather_data is None:
+            cutoff = replay_time - REPLAY_STATION_AGE
+            # A new dict each step, so weather.py's per-data-set condition cache is rebuilt
+            self.weather_data = {
+                station: data for station, data in self.stations.items()
+                if history.observation_epoch(data, replay_time) >= cutoff
+            }
+            logger.info(f"Replay at {self.describe(replay_time)}: "
+                        f"{applied} new observations, {len(self.weather_data)} stations reporting")
+            self.refresh()
+
+        if self.next_row is None and replay_time >= self.end_time:
+            if self.loop:
+                logger.info("Replay finished, starting over")
+                self.rewind()
+                return REPLAY_STEP
+            logger.info("Replay finished")
+            cleanup(None, None)
+
+        self.replay_time = min(replay_time + REPLAY_STEP * self.speed, self.end_time)
+        return REPLAY_STEP
+
+
+def main():
+    """Run the display loop (or a replay, with --replay) until the process is stopped."""
+    parser = argparse.ArgumentParser(description="METARMap LED display")
+    parser.add_argument('--replay', nargs=2, type=parse_replay_time, metavar=('START', 'END'),
+                        help="Play recorded observations between two local times (e.g. 2025-06-01T14:00) "
+                             "instead of the live weather")
+    parser.add_argument('--speed', type=float, default=60.0,
+                        help="Replay speed as a multiple of real time (default: 60)")
+    parser.add_argument('--loop', action='store_true', help="Start the replay over when it reaches END")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed for the animations' random patterns, so a replay looks the same "
+                             "every run (default: 0)")
+    args = parser.parse_args()
+
+    # Attach the signal handler to SIGINT (Ctrl+C)
+    signal.signal(signal.SIGINT, cleanup)
+    if args.replay:
+        start, end = args.replay
+        if end <= start or args.speed <= 0:
+            parser.error("--replay END must be after START and --speed must be positive")
+        ReplayDisplay(start, end, args.speed, args.loop, args.seed).run()
+        return
+
+    display = Display()
+    # systemctl reload metar.service re-reads config.py without restarting
+    signal.signal(signal.SIGHUP, display.request_reload)
+    display.run()
+
+
+if __name__ == "__main__":
+    main()
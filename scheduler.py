@@ -3,12 +3,14 @@ import schedule
 import time
 import subprocess
 from datetime import datetime
-import importlib  # For reloading the config module
 import config  # Import config for dynamic updates
 import logging
 import threading
 import weather  # Import weather module directly
-import json
+import history
+import control
+from service_state import service_states
+from file_watch import FileWatcher
 import pytz
 from astral import LocationInfo
 from astral.sun import sun
@@ -24,8 +26,15 @@ logger = logging.getLogger(__name__)
 # Create a lock for weather updates
 weather_update_lock = threading.Lock()
 
-# Add a flag to prevent infinite loops during sun time updates
-sun_time_update_in_progress = False
+CONFIG_FILE = '/home/pi/config.py'
+
+# Watches CONFIG_FILE for edits; update_sun_times registers its own writes with it
+config_watcher = None
+
+# Last merged weather data (what weather.json holds) and the last raw parse,
+# kept in memory so each update can carry over stations the API skipped
+last_good_weather = None
+last_parsed_weather = None
 
 def calculate_sun_times(city_name, date=None):
     """Calculate sunrise and sunset times for a given city and date"""
@@ -70,6 +79,7 @@ def turn_on_lights():
     """Restart the metar.service to turn on the lights."""
     try:
         subprocess.run(['systemctl', 'start', 'metar.service'], check=True)
+        service_states.invalidate('metar.service')
         logger.info("Lights turned on: METAR service started.")
         # Schedule an immediate weather update when lights turn on
         update_weather()
@@ -81,6 +91,7 @@ def turn_off_lights():
     """Stop the metar.service and run blank.py to turn off the lights."""
     try:
         subprocess.run(['systemctl', 'stop', 'metar.service'], check=True)
+        service_states.invalidate('metar.service')
         time.sleep(2)
         subprocess.run(["sudo", "/home/pi/metar/bin/python3", "/home/pi/blank.py"], check=True)
         logger.info("Lights turned off: METAR service stopped and LEDs blanked.")
@@ -90,22 +101,32 @@ def turn_off_lights():
 
 def is_metar_running():
     """Check if METAR service is running.
+
+    Reads the state cached by service_state (kept current over D-Bus) rather
+    than running systemctl on every call.
     Returns:
         bool: True if service is running, False otherwise
     """
     try:
-        result = subprocess.run(
-            ['systemctl', 'is-active', 'metar.service'],
-            capture_output=True,
-            text=True
-        )
-        return result.stdout.strip() == "active"
-    except subprocess.CalledProcessError:
+        return service_states.is_active('metar.service')
+    except OSError:
         return False
 
+def restart_metar_service():
+    """Have metar.py reload its config in place, restarting the service if it can't."""
+    if control.request_reload():
+        logger.info("METAR service reloaded its configuration")
+        return
+    try:
+        subprocess.run(['sudo', 'systemctl', 'restart', 'metar.service'], check=True)
+        service_states.invalidate('metar.service')
+        logger.info("METAR service restarted successfully")
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Error restarting METAR service: {e}")
+
 def update_weather(force=False):
     """Update weather data directly using the weather module."""
-    global weather_update_lock
+    global weather_update_lock, last_parsed_weather
     
     if not weather_update_lock.acquire(blocking=False):
         logger.info("Weather update already in progress, skipping...")
@@ -119,13 +140,19 @@ def update_weather(force=False):
         logger.info("Fetching new weather data...")
         # Call weather module functions directly instead of running as a subprocess
         metar_data = weather.fetch_metar()
-        if metar_data:
+        if metar_data is weather.NOT_MODIFIED:
+            # Nothing changed upstream - re-merge the last parse so carried-over stations can still expire
+            if last_parsed_weather:
+                save_weather(last_parsed_weather)
+            else:
+                weather.touch_weather_file()
+        elif metar_data:
             parsed_data = weather.parse_weather(metar_data)
             if parsed_data:
-                # Save the weather data
-                with open('/home/pi/weather.json', 'w') as json_file:
-                    json.dump(parsed_data, json_file, indent=4)
-                logger.info("Weather data updated successfully")
+                last_parsed_weather = parsed_data
+                save_weather(parsed_data)
+                # After the map's copy is written, so a slow SD card doesn't delay it
+                history.record_weather(parsed_data)
             else:
                 logger.error("Failed to parse weather data")
         else:
@@ -133,16 +160,48 @@ def update_weather(force=False):
     finally:
         weather_update_lock.release()
 
-def update_sun_times():
-    """Calculate and update sunrise/sunset times for the selected city."""
-    global sun_time_update_in_progress
-    
-    # Check if an update is already in progress to avoid re-entry
-    if sun_time_update_in_progress:
-        logger.debug("Sun time update already in progress, skipping this call.")
+def load_last_good_weather():
+    """Return the last merged weather data, reading weather.json on first use."""
+    global last_good_weather
+    if last_good_weather is None:
+        try:
+            last_good_weather = weather.load_weather_file()
+            # Files written before last_seen existed are as old as the file itself
+            file_time = os.path.getmtime(weather.WEATHER_FILE)
+            for airport_weather in last_good_weather.values():
+                airport_weather.setdefault('last_seen', file_time)
+            # Cycles that only touched weather.json saved the newer times separately
+            for airport_code, seen in weather.load_last_seen().items():
+                airport_weather = last_good_weather.get(airport_code)
+                if airport_weather is not None and seen > airport_weather['last_seen']:
+                    airport_weather['last_seen'] = seen
+        except Exception as e:
+            logger.info(f"No previous weather data to merge with: {e}")
+            last_good_weather = {}
+    return last_good_weather
+
+def save_weather(parsed_data):
+    """Merge freshly parsed data with the last good observations and write weather.json if it changed."""
+    global last_good_weather
+
+    ttl = getattr(config, 'STATION_TTL', 3600)
+    airport_ids = weather.get_valid_airports(config.AIRPORTS_FILE)
+    merged, changed = weather.merge_weather_data(load_last_good_weather(), parsed_data, ttl, airport_ids)
+
+    if not changed:
+        # Same observations as last time - only bump the timestamp so the map isn't marked stale,
+        # and save the stations' new last_seen times so a restart doesn't see the old ones
+        weather.touch_weather_file()
+        weather.write_last_seen(merged)
+        last_good_weather = merged
         return
 
-    sun_time_update_in_progress = True # Set flag at the very beginning
+    if weather.write_weather_data(merged):
+        last_good_weather = merged
+        logger.info("Weather data updated successfully")
+
+def update_sun_times():
+    """Calculate and update sunrise/sunset times for the selected city."""
     try:
         # Only update if sunrise/sunset is enabled and a city is selected
         if not getattr(config, 'USE_SUNRISE_SUNSET', False) or not getattr(config, 'SELECTED_CITY', None):
@@ -154,26 +213,39 @@ def update_sun_times():
         sunrise, sunset = calculate_sun_times(city_name)
         
         if sunrise and sunset:
-            with open('/home/pi/config.py', 'r') as f:
+            with open(CONFIG_FILE, 'r') as f:
                 config_lines = f.readlines()
-                        
+
+            new_lines = []
+            for line in config_lines:
+                if line.startswith('BRIGHT_TIME_START'):
+                    new_lines.append(f"BRIGHT_TIME_START = datetime.time({sunrise.hour}, {sunrise.minute})\n")
+                elif line.startswith('DIM_TIME_START'):
+                    new_lines.append(f"DIM_TIME_START = datetime.time({sunset.hour}, {sunset.minute})\n")
+                else:
+                    new_lines.append(line)
+            content = ''.join(new_lines)
+            if content == ''.join(config_lines):
+                logger.info(f"Sun times for {city_name} unchanged")
+                return
+
+            # The config monitor recognizes this write by its hash and leaves it to us
+            if config_watcher is not None:
+                config_watcher.expect(content)
+
             # Use a temporary file for atomic write to prevent corruption
-            temp_config_path = '/home/pi/config.py.tmp'
+            temp_config_path = CONFIG_FILE + '.tmp'
             with open(temp_config_path, 'w') as f:
-                for line in config_lines:
-                    if line.startswith('BRIGHT_TIME_START'):
-                        f.write(f"BRIGHT_TIME_START = datetime.time({sunrise.hour}, {sunrise.minute})\n")
-                    elif line.startswith('DIM_TIME_START'):
-                        f.write(f"DIM_TIME_START = datetime.time({sunset.hour}, {sunset.minute})\n")
-                    else:
-                        f.write(line)
+                f.write(content)
             
             # Atomically replace the old config file with the new one
-            os.replace(temp_config_path, '/home/pi/config.py')
+            os.replace(temp_config_path, CONFIG_FILE)
             logger.info("config.py updated with new sun times.")
 
-            # Reload the config module
-            importlib.reload(config)
+            # Reload the config module, and have the display pick up the new dimming times
+            weather.reload_config()
+            if is_metar_running():
+                restart_metar_service()
             logger.info(f"Updated sun times for {city_name}: Bright at {sunrise.hour:02d}:{sunrise.minute:02d}, Dim at {sunset.hour:02d}:{sunset.minute:02d}")
             
         else:
@@ -181,12 +253,6 @@ def update_sun_times():
             
     except Exception as e:
         logger.error(f"Error updating sun times: {e}")
-    finally:
-        # Add a small delay to ensure file system settles and monitor has a chance to see the change
-        # while the flag is still True.
-        time.sleep(2)
-        # Clear flag in finally block to ensure it's always reset
-        sun_time_update_in_progress = False
 
 def schedule_lights(initial_run=False):
     """Schedule lights on/off and weather updates based on the current configuration."""
@@ -224,16 +290,40 @@ def schedule_lights(initial_run=False):
         logger.info("Lights scheduling is disabled")
 
 
-def monitor_config_changes(config_file):
-    """Monitor config.py for changes and reload schedules dynamically."""
-    last_modified = os.path.getmtime(config_file)
-    last_check = time.time()  # Initialize with timestamp
+def apply_config_change():
+    """Reload config.py after it was edited and bring the display and schedules in line with it."""
+    # Check if METAR service was running before config change
+    was_running = is_metar_running()
+    
+    # Reload the config module (and weather.py's copy of it) to get updated values
+    weather.reload_config()
+    
+    # Only reload the METAR service if it was already running
+    if was_running:
+        restart_metar_service()
+    else:
+        logger.info("METAR service was not running, skipping restart")
+    
+    # Reschedule with the updated values
+    schedule_lights(initial_run=False)
+
+    # Only handle lights state if the service was running AND lights scheduling is enabled
+    if was_running and config.ENABLE_LIGHTS_OFF:
+        now = datetime.now().time()  # Get current time for comparison
+        lights_off = (
+            (config.LIGHTS_OFF_TIME > config.LIGHTS_ON_TIME and (now >= config.LIGHTS_OFF_TIME or now < config.LIGHTS_ON_TIME)) or
+            (config.LIGHTS_OFF_TIME <= config.LIGHTS_ON_TIME and config.LIGHTS_OFF_TIME <= now < config.LIGHTS_ON_TIME)
+        )
+        if lights_off:
+            turn_off_lights()
+        else:
+            turn_on_lights()
+
+def monitor_config_changes(watcher):
+    """Run scheduled jobs, reacting to config.py edits as soon as watcher reports them."""
     last_service_status = is_metar_running()  # Initial service status
 
     while True:
-        current_time = time.time()  # Get current timestamp
-        
-        # Run scheduled tasks every second
         schedule.run_pending()
         
         # Check METAR service status
@@ -245,55 +335,18 @@ def monitor_config_changes(config_file):
                 schedule_lights(initial_run=False)  # This will schedule weather updates if enabled
             else:
                 logger.info("METAR service has stopped, weather updates will be skipped.")
-        
-        # Check for config changes every few seconds
-        if current_time - last_check >= 5:
-            current_modified = os.path.getmtime(config_file)
-            if current_modified != last_modified and not sun_time_update_in_progress:
-                logger.info("Detected config.py changes. Reloading schedules...")
-                last_modified = current_modified
-                
-                # Check if METAR service was running before config change
-                was_running = is_metar_running()
-                
-                # Reload the config module to get updated values
-                importlib.reload(config)
-                
-                # Only restart the METAR service if it was already running
-                if was_running:
-                    try:
-                        subprocess.run(['sudo', 'systemctl', 'restart', 'metar.service'], check=True)
-                        logger.info("METAR service restarted successfully")
-                    except subprocess.CalledProcessError as e:
-                        logger.error(f"Error restarting METAR service: {e}")
-                else:
-                    logger.info("METAR service was not running, skipping restart")
-                
-                # Reschedule with the updated values
-                schedule_lights(initial_run=False)
-
-                # Only handle lights state if the service was running AND lights scheduling is enabled
-                if was_running and config.ENABLE_LIGHTS_OFF:
-                    now = datetime.now().time()  # Get current time for comparison
-                    lights_off = (
-                        (config.LIGHTS_OFF_TIME > config.LIGHTS_ON_TIME and (now >= config.LIGHTS_OFF_TIME or now < config.LIGHTS_ON_TIME)) or
-                        (config.LIGHTS_OFF_TIME <= config.LIGHTS_ON_TIME and config.LIGHTS_OFF_TIME <= now < config.LIGHTS_ON_TIME)
-                    )
-                    if lights_off:
-                        turn_off_lights()
-                    else:
-                        turn_on_lights()
-
-            elif current_modified != last_modified and sun_time_update_in_progress:
-               logger.debug("Config file changed, but sun time update in progress. Skipping reload.")
-            
-            last_check = current_time  # Update last check timestamp
-        
-        time.sleep(5)  # Sleep for 5 seconds between checks
+
+        # Sleep until the next job (re-checking the service at least every 5 seconds)
+        # or until config.py changes
+        idle = schedule.idle_seconds()
+        timeout = 5 if idle is None else min(max(idle, 0), 5)
+        if watcher.wait_for_change(timeout) is not None:
+            logger.info("Detected config.py changes. Reloading schedules...")
+            apply_config_change()
 
 
 if __name__ == "__main__":
     # Monitor config changes and run scheduler
-    config_file = "/home/pi/config.py"
+    config_watcher = FileWatcher(CONFIG_FILE)
     schedule_lights(initial_run=True)  # Initial scheduling, run all initial tasks
-    monitor_config_changes(config_file)
+    monitor_config_changes(config_watcher)
@@ -0,0 +1,163 @@
+"""
+METARMap service state
+
+Tells the scheduler and settings app whether a systemd unit is running without
+forking `systemctl is-active` for every check. When jeepney is installed the
+watcher subscribes to systemd's PropertiesChanged signals on the system D-Bus
+and keeps each unit's ActiveState in memory, so a check is a dict lookup.
+Without it (or without a system bus) `systemctl is-active` results are cached
+for FALLBACK_TTL seconds. D-Bus states are re-read after DBUS_MAX_AGE seconds
+too, so one missed signal can't leave a wrong state cached for good.
+"""
+
+import logging
+import subprocess
+import threading
+import time
+
+try:
+    from jeepney import DBusAddress, HeaderFields, MatchRule, message_bus, new_method_call
+    from jeepney.wrappers import unwrap_msg
+    from jeepney.io.threading import DBusRouter, open_dbus_connection
+except ImportError:
+    DBusRouter = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds a `systemctl is-active` result is reused when D-Bus isn't available
+FALLBACK_TTL = 5
+# Seconds a state from D-Bus is trusted without a fresh signal before it is read again
+DBUS_MAX_AGE = 60
+
+_SYSTEMD = 'org.freedesktop.systemd1'
+_UNIT_INTERFACE = 'org.freedesktop.systemd1.Unit'
+_MANAGER = None if DBusRouter is None else DBusAddress(
+    '/org/freedesktop/systemd1', bus_name=_SYSTEMD, interface='org.freedesktop.systemd1.Manager')
+
+
+class ServiceStateWatcher:
+    """Cached ActiveState ('active', 'inactive', 'failed', ...) of systemd units."""
+
+    def __init__(self, ttl=FALLBACK_TTL, use_dbus=True, max_age=DBUS_MAX_AGE):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._use_dbus = use_dbus and DBusRouter is not None
+        self._router = None
+        self._connect_attempted = False
+        self._connect_lock = threading.Lock()
+        self._states = {}      # Unit name -> (monotonic time, ActiveState)
+        self._unit_paths = {}  # D-Bus object path -> unit name
+        self._paths = {}       # Unit name -> D-Bus object path
+        self._lock = threading.Lock()
+
+    @property
+    def using_dbus(self):
+        return self._router is not None
+
+    def _connect(self):
+        """Open the system bus and subscribe to unit property changes, once."""
+        with self._connect_lock:
+            if self._connect_attempted:
+                return
+            self._connect_attempted = True
+            if self._use_dbus:
+                self._open_dbus()
+
+    def _open_dbus(self):
+        router = None
+        try:
+            router = DBusRouter(open_dbus_connection(bus='SYSTEM'))
+            match = dict(type='signal', interface='org.freedesktop.DBus.Properties',
+                         member='PropertiesChanged', path_namespace='/org/freedesktop/systemd1/unit')
+            # Signals arrive with systemd's unique name (:1.x) as the sender, so the well-known
+            # name only goes in the bus-side rule. The local filter is unbounded and registered
+            # before AddMatch, so no state change is dropped.
+            signals = router.filter(MatchRule(**match), bufsize=0)
+            unwrap_msg(router.send_and_get_reply(message_bus.AddMatch(MatchRule(sender=_SYSTEMD, **match)),
+                                                 timeout=5))
+            # systemd only emits unit signals once a client has subscribed
+            unwrap_msg(router.send_and_get_reply(new_method_call(_MANAGER, 'Subscribe'), timeout=5))
+        except Exception as e:
+            logger.info(f"systemd D-Bus unavailable ({e}), caching systemctl is-active for {self.ttl}s instead")
+            if router is not None:
+                router.close()
+                router.conn.close()
+            return
+
+        self._router = router
+        threading.Thread(target=self._listen, args=(signals.queue,), name="service-state", daemon=True).start()
+        logger.info("Watching systemd unit states over D-Bus")
+
+    def _listen(self, queue):
+        while True:
+            message = queue.get()
+            interface, changed, _ = message.body
+            unit = self._unit_paths.get(message.header.fields.get(HeaderFields.path))
+            if unit and interface == _UNIT_INTERFACE and 'ActiveState' in changed:
+                state = changed['ActiveState'][1]
+                with self._lock:
+                    if self._states.get(unit, (0, None))[1] != state:
+                        logger.debug(f"{unit} is now {state}")
+                    self._states[unit] = (time.monotonic(), state)
+
+    def _read_dbus(self, unit):
+        """Look up a unit's object path (first time only) and read its ActiveState."""
+        path = self._paths.get(unit)
+        if path is None:
+            reply = self._router.send_and_get_reply(new_method_call(_MANAGER, 'LoadUnit', 's', (unit,)), timeout=5)
+            path = unwrap_msg(reply)[0]
+            self._unit_paths[path] = unit
+            self._paths[unit] = path
+        properties = DBusAddress(path, bus_name=_SYSTEMD, interface='org.freedesktop.DBus.Properties')
+        reply = self._router.send_and_get_reply(
+            new_method_call(properties, 'Get', 'ss', (_UNIT_INTERFACE, 'ActiveState')), timeout=5)
+        return unwrap_msg(reply)[0][1]
+
+    def _read_systemctl(self, unit):
+        result = subprocess.run(['systemctl', 'is-active', unit], capture_output=True, text=True)
+        return result.stdout.strip() or 'unknown'
+
+    def state(self, unit):
+        """Current ActiveState of unit (e.g. 'metar.service')."""
+        self._connect()
+        now = time.monotonic()
+        with self._lock:
+            cached = self._states.get(unit)
+        max_age = self.ttl if self._router is None else self.max_age
+        if cached is not None and now - cached[0] < max_age:
+            return cached[1]
+
+        if self._router is not None:
+            try:
+                state = self._read_dbus(unit)
+            except Exception as e:
+                logger.warning(f"Failed to read {unit} state over D-Bus: {e}")
+                return self._read_systemctl(unit)
+        else:
+            state = self._read_systemctl(unit)
+        with self._lock:
+            self._states[unit] = (now, state)
+        return state
+
+    def is_active(self, unit):
+        return self.state(unit) == 'active'
+
+    def invalidate(self, unit=None):
+        """
+        Forget cached states (all units when unit is None) after starting or
+        stopping a service, so the next check reads the state afresh rather than
+        waiting out the TTL or racing the D-Bus signal.
+        """
+        with self._lock:
+            if unit is None:
+                self._states.clear()
+            else:
+                self._states.pop(unit, None)
+
+
+# Shared by everything in this process. Connects to D-Bus on first use.
+service_states = ServiceStateWatcher()
+
+def is_active(unit):
+    """True if the systemd unit is active."""
+    return service_states.is_active(unit)
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response
 import subprocess
 import os
 from config import *
@@ -8,17 +8,24 @@ import shutil
 import re
 import time
 import threading
-import importlib
 import logging
 import json
 import signal
 import sys
 import schedule
 import weather
+import control
+import journal
+from service_state import service_states
 import functools
 import socket
+import gzip
+import hashlib
+from collections import namedtuple
+from concurrent.futures import TimeoutError as JobTimeoutError
+from background import BackgroundJobs
+from event_stream import EventHub, TooManySubscribers
 from scheduler import weather_update_lock, update_weather as scheduler_update_weather, calculate_sun_times
-from led_test import test_leds, turn_off_leds, update_brightness
 
 # Import the update manager
 from update_manager import (
@@ -30,6 +37,25 @@ from update_manager import (
     write_config_file  # Added for robust config handling
 )
 
+# Optional production WSGI server; without it the app falls back to Flask's threaded server
+try:
+    from cheroot import wsgi as cheroot_wsgi
+    from cheroot.ssl.builtin import BuiltinSSLAdapter
+except ImportError:
+    cheroot_wsgi = None
+
+SSL_CERT_FILE = '/etc/ssl/certs/flask-selfsigned.crt'
+SSL_KEY_FILE = '/etc/ssl/private/flask-selfsigned.key'
+
+# Seconds a request waits on a background job before answering without its result
+WEATHER_UPDATE_WAIT = 60
+UPDATE_CHECK_WAIT = 60
+SERVICE_LOGS_WAIT = 15
+# Live log streams open at once; each holds a server thread and a journalctl
+MAX_LOG_STREAMS = 2
+# Seconds between keep-alives on a log stream; a closed page holds its slot at most this long
+LOG_STREAM_HEARTBEAT = 5
+
 def after_this_response(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
@@ -43,9 +69,17 @@ app = Flask(__name__,
            static_folder='static')
 app.secret_key = os.urandom(24)
 
+# Weather fetches, git fetch and journalctl run here so they don't hold up request threads,
+# and concurrent requests for the same job share one run
+background_jobs = BackgroundJobs(max_workers=2)
+
+# Every open /events stream holds a server thread, so leave some for ordinary requests
+event_hub = EventHub(max_subscribers=max(1, getattr(config, 'SETTINGS_WORKERS', 16) - 4))
+
 
 def reload_config():
-    importlib.reload(config)
+    # Reloads the config module and weather.py's copy of the thresholds and colors
+    weather.reload_config()
 
     # Update global variables dynamically
     for key in dir(config):
@@ -98,11 +132,13 @@ def reload_config():
 @app.route('/leds/on', methods=['POST'])
 def turn_on_leds():
     subprocess.run(['sudo', 'systemctl', 'start', 'metar.service'])
+    service_states.invalidate('metar.service')
     return jsonify({"status": "LEDs turned on"}), 200
 
 @app.route('/leds/off', methods=['POST'])
 def turn_off_leds():
     subprocess.run(['sudo', 'systemctl', 'stop', 'metar.service'])
+    service_states.invalidate('metar.service')
     subprocess.run(['sudo', '/home/pi/metar/bin/python3', '/home/pi/blank.py'])
     return jsonify({"status": "LEDs turned off"}), 200
 
@@ -110,8 +146,10 @@ def turn_off_leds():
 def update_weather_page():
     try:
         # Use the scheduler's update_weather function
-        scheduler_update_weather()
+        background_jobs.run('update-weather', scheduler_update_weather, timeout=WEATHER_UPDATE_WAIT)
         flash('Weather Has Been Updated!', 'success')
+    except JobTimeoutError:
+        flash('Weather update is still running, check back shortly.', 'info')
     except Exception as e:
         flash(f'Weather Update Has Failed... {str(e)}', 'danger')
     return redirect(url_for('edit_settings'))
@@ -120,8 +158,11 @@ def update_weather_page():
 def refresh_weather():
     """Endpoint to manually trigger a weather update."""
     try:
-        scheduler_update_weather(force=True)  # Force update regardless of service state
+        # Force update regardless of service state
+        background_jobs.run('update-weather', scheduler_update_weather, force=True, timeout=WEATHER_UPDATE_WAIT)
         return jsonify({'status': 'success', 'message': 'Weather update requested'})
+    except JobTimeoutError:
+        return jsonify({'status': 'success', 'message': 'Weather update still running'}), 202
     except Exception as e:
         app.logger.error(f"Error requesting weather update: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -129,15 +170,10 @@ def refresh_weather():
 @app.route('/leds/status', methods=['GET'])
 def get_led_status():
     try:
-        # Check if the metar.service is active
-        result = subprocess.run(
-            ['systemctl', 'is-active', 'metar.service'],
-            capture_output=True, text=True
-        )
-        # Determine LED status based on service status
-        led_status = "on" if result.stdout.strip() == "active" else "off"
+        # Determine LED status based on whether metar.service is active
+        led_status = "on" if service_states.is_active('metar.service') else "off"
         return jsonify({"status": led_status}), 200
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         return jsonify({"status": "off", "error": str(e)}), 500
 
 
@@ -695,19 +731,19 @@ def connect_to_network():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def service_status(service_name):
+    """Status payload for one service, as returned by /service/status and the 'services' event."""
+    status = service_states.state(f'{service_name}.service')
+    is_running = status == "active"
+    return {
+        "status": "running" if is_running else "stopped",
+        "message": f"Service is {status}"
+    }
+
 @app.route('/service/status/<service_name>', methods=['GET'])
 def get_service_status(service_name):
     try:
-        result = subprocess.run(
-            ['systemctl', 'is-active', f'{service_name}.service'],
-            capture_output=True, text=True
-        )
-        status = result.stdout.strip()
-        is_running = status == "active"
-        return jsonify({
-            "status": "running" if is_running else "stopped",
-            "message": f"Service is {status}"
-        })
+        return jsonify(service_status(service_name))
     except Exception as e:
         return jsonify({
             "status": "unknown",
@@ -746,6 +782,7 @@ def control_service(service_name, action):
         else:
             # Handle all other service control actions normally
             subprocess.run(['sudo', 'systemctl', action, f'{service_name}.service'], check=True)
+        service_states.invalidate(f'{service_name}.service')
 
         return jsonify({
             "message": f"Service {action} successful",
@@ -757,22 +794,21 @@ def control_service(service_name, action):
 @app.route('/service/logs/<service_name>', methods=['GET'])
 def get_service_logs(service_name):
     try:
-        # Get logs for any service with consistent formatting, limited to last 200 lines
-        result = subprocess.run(
-            ['sudo', 'journalctl', '-u', f'{service_name}.service', '-n', '200',
-             '-o', 'short', '--no-pager', '--no-hostname'],
-            capture_output=True,
-            text=True,
-            check=True  # This will raise an exception if the command fails
-        )
-
-        if result.stderr:
-            print(f"Warning getting logs for {service_name}: {result.stderr}")
-
+        # With ?cursor= only entries newer than the client's last one are read and sent
+        cursor = request.args.get('cursor') or None
+        lines, cursor = background_jobs.run(('logs', service_name, cursor), journal.read_journal,
+                                            service_name, cursor, timeout=SERVICE_LOGS_WAIT)
         return jsonify({
-            "logs": result.stdout if result.stdout else "No logs available",
+            "logs": "\n".join(lines) if lines or cursor else "No logs available",
+            "lines": lines,
+            "cursor": cursor,
             "success": True
         })
+    except JobTimeoutError:
+        return jsonify({
+            "error": f"Timed out reading logs for {service_name}",
+            "success": False
+        }), 504
     except subprocess.CalledProcessError as e:
         error_msg = f"Error getting logs for {service_name}: {e.stderr}"
         print(error_msg)
@@ -788,6 +824,49 @@ def get_service_logs(service_name):
             "success": False
         }), 500
 
+log_streams = threading.BoundedSemaphore(MAX_LOG_STREAMS)
+
+def log_stream_slot():
+    """Take a log stream slot. Returns its release function (safe to call twice), or None if all are taken."""
+    if not log_streams.acquire(blocking=False):
+        return None
+    released = threading.Lock()
+    def release():
+        if released.acquire(blocking=False):
+            log_streams.release()
+    return release
+
+def stream_service_logs(service_name, cursor, release):
+    """Yield SSE 'log' events for new journal entries, each carrying its cursor as the event id."""
+    # A short heartbeat so a closed page is noticed (the next write fails) within seconds
+    entries = journal.follow(service_name, cursor, heartbeat=LOG_STREAM_HEARTBEAT)
+    try:
+        yield b"retry: 5000\n\n"
+        for lines, cursor in entries:
+            if lines is None:
+                yield b": keep-alive\n\n"
+                continue
+            data = json.dumps(lines)
+            yield f"id: {cursor}\nevent: log\ndata: {data}\n\n".encode('utf-8')
+    finally:
+        # Runs on GeneratorExit when the client goes away: stop journalctl, free the slot
+        entries.close()
+        release()
+
+@app.route('/service/logs/<service_name>/stream')
+def stream_service_logs_route(service_name):
+    """Follow a service's log as server-sent events, resuming after Last-Event-ID or ?cursor=."""
+    release = log_stream_slot()
+    if release is None:
+        # The page falls back to polling with ?cursor=
+        return jsonify({"error": "Too many log streams open", "success": False}), 503
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor') or None
+    response = Response(stream_service_logs(service_name, cursor, release), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Also covers a response closed before the generator ever started (its finally never runs)
+    response.call_on_close(release)
+    return response
 
 @app.route('/weather-status')
 def weather_status():
@@ -924,8 +1003,13 @@ def set_timezone():
 def check_for_updates_route():
     """Check for available updates using the update manager."""
     try:
-        result = check_for_updates()
+        # git fetch can take a while on slow WiFi; simultaneous checks share one run
+        result = background_jobs.run('check-for-updates', check_for_updates, timeout=UPDATE_CHECK_WAIT)
         return jsonify(result)
+    except JobTimeoutError:
+        return jsonify({
+            'error': 'Update check is taking longer than expected, try again shortly'
+        }), 504
     except Exception as e:
         error_msg = f"Error checking for updates: {str(e)}"
         app.logger.error(error_msg)
@@ -985,23 +1069,24 @@ def get_local_ip():
 @app.route('/airport-conditions')
 def get_airport_conditions():
     try:
-        # Read weather data from the correct path
-        with open('/home/pi/weather.json', 'r') as f:
-            weather_data = json.load(f)
-
-        airports = []
-        for icao, data in weather_data.items():
-            airport_info = {
-                'icao': icao,
-                'site': data.get('site', icao),
-                'lat': data.get('latitude'),
-                'lon': data.get('longitude'),
-                'fltCat': data.get('flt_cat', 'MISSING'),
-                'raw_observation': data.get('raw_observation', 'No data available')
-            }
-            airports.append(airport_info)
-
-        return jsonify({'airports': airports})
+        # Shared in-memory copy, only re-parsed when weather.json changes
+        version, weather_data = weather.weather_cache.snapshot()
+
+        def build():
+            airports = []
+            for icao, data in weather_data.items():
+                airport_info = {
+                    'icao': icao,
+                    'site': data.get('site', icao),
+                    'lat': data.get('latitude'),
+                    'lon': data.get('longitude'),
+                    'fltCat': data.get('flt_cat', 'MISSING'),
+                    'raw_observation': data.get('raw_observation', 'No data available')
+                }
+                airports.append(airport_info)
+            return {'airports': airports}
+
+        return cached_json_response('airport-conditions', version, build)
 
     except FileNotFoundError:
         return jsonify({'error': 'Weather data file not found'}), 404
@@ -1128,9 +1213,10 @@ def apply_kiosk_filters():
                 else:
                     f.write("SKIP\n")
 
-        # Restart only the LED display service
+        # Have the LED display pick up the new airports, restarting it only if it can't reload in place
         try:
-            subprocess.run(['sudo', 'systemctl', 'restart', 'metar.service'], check=True)
+            if not control.request_reload():
+                subprocess.run(['sudo', 'systemctl', 'restart', 'metar.service'], check=True)
             return jsonify({
                 'success': True,
                 'count': len(selected_airports)
@@ -1152,9 +1238,10 @@ def reset_kiosk():
         if os.path.exists('airports.txt.backup'):
             shutil.copy('airports.txt.backup', AIRPORTS_FILE)
 
-            # Restart the METAR service to apply changes immediately
+            # Reload (or failing that restart) the METAR service to apply changes immediately
             try:
-                subprocess.run(['sudo', 'systemctl', 'restart', 'metar.service'], check=True)
+                if not control.request_reload():
+                    subprocess.run(['sudo', 'systemctl', 'restart', 'metar.service'], check=True)
                 return jsonify({'success': True})
             except subprocess.CalledProcessError as e:
                 return jsonify({
@@ -1166,24 +1253,26 @@ def reset_kiosk():
         logger.error(f"Error resetting kiosk: {e}")
         return jsonify({'error': str(e)}), 500
 
+def condition_airports(weather_data):
+    """Windy, lightning and snowy airports with their colors, for the kiosk page."""
+    # Use existing weather.py functions
+    return {
+        'windy': weather.get_windy_airports(weather_data),
+        'lightning': weather.get_lightning_airports(weather_data),
+        'snowy': weather.get_snowy_airports(weather_data)
+    }
+
 @app.route('/kiosk/condition-airports')
 def get_condition_airports():
     try:
         # Read weather data
-        weather_data = weather.read_weather_data()
+        version, weather_data = weather.weather_cache.snapshot()
         if not weather_data:
             return jsonify({'error': 'No weather data available'}), 404
             
-        # Use existing weather.py functions
-        windy_airports = weather.get_windy_airports(weather_data)
-        lightning_airports = weather.get_lightning_airports(weather_data)
-        snowy_airports = weather.get_snowy_airports(weather_data)
-        
-        return jsonify({
-            'windy': windy_airports,
-            'lightning': lightning_airports,
-            'snowy': snowy_airports
-        })
+        # Condition sets depend on the wind threshold and colors as well as the data
+        version = (version, weather.config_version)
+        return cached_json_response('condition-airports', version, lambda: condition_airports(weather_data))
     except Exception as e:
         logger.error(f"Error getting condition airports: {e}")
         return jsonify({'error': str(e)}), 500
@@ -1191,12 +1280,11 @@ def get_condition_airports():
 @app.route('/get-weather-data')
 def get_weather_data():
     try:
-        weather_file_path = '/home/pi/weather.json'
-        app.logger.info(f"Reading weather data from: {weather_file_path}")
-        with open(weather_file_path, 'r') as f:
-            weather_data = json.load(f)
-        app.logger.info("Successfully loaded weather data")
-        return jsonify(weather_data)
+        if not os.path.exists(weather.WEATHER_FILE):
+            raise FileNotFoundError(weather.WEATHER_FILE)
+        # Shared in-memory copy, only re-parsed when weather.json changes
+        version, weather_data = weather.weather_cache.snapshot()
+        return cached_json_response('weather-data', version, lambda: weather_data)
     except FileNotFoundError:
         app.logger.error("Weather data file not found")
         return jsonify({"error": "Weather data not found"}), 404
@@ -1231,6 +1319,17 @@ def test_leds_route():
         except ValueError:
             return jsonify({'error': 'Invalid end_pixel value'}), 400
     
+    # Let the running LED service show the pattern; it owns the strip
+    try:
+        reply = control.send_command('test', color=list(rgb), start_pixel=start_pixel, end_pixel=end_pixel)
+        if reply.get('success'):
+            return jsonify({'success': True, 'output': 'Test pattern shown by the METAR service'})
+        return jsonify({'error': f"Failed to test LEDs: {reply.get('error')}"}), 500
+    except control.ControlUnavailable:
+        pass  # METAR service isn't running - drive the strip from a one-off script
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'Failed to test LEDs: {str(e)}'}), 500
+
     try:
         # Create a simple script that imports and uses the led_test module
         temp_script = '/tmp/led_test_temp.py'
@@ -1285,6 +1384,17 @@ except Exception as e:
 
 @app.route('/turn-off-leds', methods=['POST'])
 def turn_off_leds_route():
+    # Let the running LED service blank the strip; it owns the strip
+    try:
+        reply = control.send_command('off')
+        if reply.get('success'):
+            return jsonify({'success': True, 'output': 'LEDs turned off by the METAR service'})
+        return jsonify({'error': f"Failed to turn off LEDs: {reply.get('error')}"}), 500
+    except control.ControlUnavailable:
+        pass  # METAR service isn't running - drive the strip from a one-off script
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'Failed to turn off LEDs: {str(e)}'}), 500
+
     try:
         # Create a simple script that imports and uses the led_test module
         temp_script = '/tmp/led_off_temp.py'
@@ -1342,6 +1452,17 @@ def update_brightness_route():
     brightness = data.get('brightness')
     if not brightness:
         return jsonify({'error': 'No brightness provided'}), 400
+
+    # Let the running LED service change the brightness; it owns the strip
+    try:
+        reply = control.send_command('brightness', value=float(brightness))
+        if reply.get('success'):
+            return jsonify({'success': True, 'output': 'Brightness updated by the METAR service'})
+        return jsonify({'error': f"Failed to update brightness: {reply.get('error')}"}), 500
+    except control.ControlUnavailable:
+        pass  # METAR service isn't running - drive the strip from a one-off script
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'Failed to update brightness: {str(e)}'}), 500
     
     try:
         # Create a self-contained script that doesn't rely on importing led_test
@@ -1403,12 +1524,33 @@ except Exception as e:
     except Exception as e:
         return jsonify({'error': f'Failed to update brightness: {str(e)}'}), 500
 
+# LED control channel served by metar.py
+@app.route('/led-control/status', methods=['GET'])
+def led_control_status():
+    try:
+        reply = control.send_command('ping', timeout=1)
+        return jsonify({'success': True, 'available': True, 'manual': reply.get('manual', False)})
+    except (control.ControlUnavailable, OSError, ValueError):
+        return jsonify({'success': True, 'available': False, 'manual': False})
+
+@app.route('/led-control/resume', methods=['POST'])
+def led_control_resume():
+    """Hand the LEDs back to the weather display after a test pattern or blanking."""
+    try:
+        reply = control.send_command('resume')
+        return jsonify(reply)
+    except control.ControlUnavailable:
+        return jsonify({'success': False, 'error': 'METAR service is not running'})
+    except (OSError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # LED Test Service Control
 @app.route('/led-test-service/start', methods=['POST'])
 def start_led_test_service():
     try:
         result = subprocess.run(['sudo', 'systemctl', 'start', 'ledtest.service'], 
                                capture_output=True, text=True)
+        service_states.invalidate('ledtest.service')
         if result.returncode == 0:
             return jsonify({'success': True})
         else:
@@ -1423,6 +1565,7 @@ def stop_led_test_service():
     try:
         result = subprocess.run(['sudo', 'systemctl', 'stop', 'ledtest.service'], 
                                capture_output=True, text=True)
+        service_states.invalidate('ledtest.service')
         if result.returncode == 0:
             return jsonify({'success': True})
         else:
@@ -1435,9 +1578,7 @@ def stop_led_test_service():
 @app.route('/led-test-service/status', methods=['GET'])
 def led_test_service_status():
     try:
-        result = subprocess.run(['systemctl', 'is-active', 'ledtest.service'], 
-                               capture_output=True, text=True)
-        is_active = result.stdout.strip() == 'active'
+        is_active = service_states.is_active('ledtest.service')
         return jsonify({'success': True, 'active': is_active})
     except Exception as e:
         app.logger.error(f"Error checking LED test service status: {str(e)}")
@@ -1579,15 +1720,129 @@ def validate_config():
             'file_size': 0
         })
 
-if __name__ == '__main__':
-    if ENABLE_HTTPS:
-        app.run(
-            host='0.0.0.0',
-            port=443,
-            ssl_context=(
-                '/etc/ssl/certs/flask-selfsigned.crt',
-                '/etc/ssl/private/flask-selfsigned.key'
-            )
-        )
+#######------ JSON RESPONSE CACHE ------#######
+
+# Serialized JSON kept per endpoint with its ETag and a gzip copy, rebuilt only when the version changes
+CachedJson = namedtuple('CachedJson', 'version etag body gzip_body')
+_json_cache = {}
+
+def cached_json_response(name, version, build):
+    """
+    Return build()'s payload as JSON, serialized and compressed once per version.
+
+    The response carries a strong ETag (a hash of the body), so clients that
+    send it back in If-None-Match get a 304 with no body; clients that accept
+    gzip get the pre-compressed copy.
+    """
+    entry = _json_cache.get(name)
+    if entry is None or entry.version != version:
+        body = app.json.dumps(build()).encode('utf-8')
+        entry = CachedJson(version, hashlib.sha1(body).hexdigest()[:24], body, gzip.compress(body, 6))
+        _json_cache[name] = entry
+
+    use_gzip = 'gzip' in request.accept_encodings
+    # Each encoding is a separate representation and needs its own strong ETag
+    etag = entry.etag + ('-gzip' if use_gzip else '')
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        app.run(host='0.0.0.0', port=80, debug=False)
+        response = Response(entry.gzip_body if use_gzip else entry.body, mimetype='application/json')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidate, which costs a 304
+    return response
+
+#######------ EVENT STREAM ------#######
+
+# How often the event producer re-checks weather and service state. Every check is
+# an in-memory or cached read, and it runs once however many pages are subscribed.
+EVENT_POLL_INTERVAL = 2
+EVENT_SERVICES = ('metar', 'settings', 'scheduler')
+
+_event_producer = None
+_event_producer_lock = threading.Lock()
+
+def weather_status_payload():
+    """weather.json's last update time in the /weather-status format, for the 'weather' event."""
+    try:
+        last_modified = datetime.datetime.fromtimestamp(os.path.getmtime(weather.WEATHER_FILE))
+    except OSError:
+        return {
+            "last_updated": "Weather data not available",
+            "formatted_date": "Weather data not available",
+            "success": False
+        }
+    return {
+        "last_updated": last_modified.strftime('%Y-%m-%d %H:%M:%S'),
+        "formatted_date": last_modified.strftime('%m-%d-%Y %H:%M:%S'),
+        "success": True
+    }
+
+def publish_events():
+    """Publish the weather, condition and service snapshots; the hub drops the ones that didn't change."""
+    last_version = None
+    while True:
+        if event_hub.subscriber_count:
+            try:
+                version, weather_data = weather.weather_cache.snapshot()
+                event_hub.publish('weather', dict(weather_status_payload(), version=version))
+                # Condition sets also depend on the wind threshold and colors
+                if (version, weather.config_version) != last_version:
+                    event_hub.publish('conditions', condition_airports(weather_data))
+                    last_version = (version, weather.config_version)
+                event_hub.publish('services', {name: service_status(name) for name in EVENT_SERVICES})
+            except Exception as e:
+                app.logger.error(f"Error publishing events: {e}")
+        time.sleep(EVENT_POLL_INTERVAL)
+
+def start_event_producer():
+    global _event_producer
+    with _event_producer_lock:
+        if _event_producer is None:
+            _event_producer = threading.Thread(target=publish_events, name="event-producer", daemon=True)
+            _event_producer.start()
+
+@app.route('/events')
+def events():
+    """Server-sent events: 'weather', 'conditions' and 'services' snapshots, sent when they change."""
+    start_event_producer()
+    try:
+        subscriber = event_hub.subscribe()
+    except TooManySubscribers as e:
+        # Pages fall back to polling when the stream is refused
+        return jsonify({'error': str(e)}), 503
+    response = Response(event_hub.stream(subscriber), mimetype='text/event-stream')
+    # stream()'s finally only runs once the body is iterated; a client that disconnects
+    # before the first chunk would otherwise keep its slot
+    response.call_on_close(lambda: event_hub.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def serve():
+    """
+    Serve the app with cheroot's thread-pool WSGI server (keep-alive, TLS),
+    falling back to Flask's threaded development server if cheroot isn't installed.
+    """
+    port = 443 if ENABLE_HTTPS else 80
+    workers = getattr(config, 'SETTINGS_WORKERS', 16)
+
+    if cheroot_wsgi is None:
+        app.logger.warning("cheroot is not installed, using Flask's development server")
+        ssl_context = (SSL_CERT_FILE, SSL_KEY_FILE) if ENABLE_HTTPS else None
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True, ssl_context=ssl_context)
+        return
+
+    server = cheroot_wsgi.Server(('0.0.0.0', port), app, numthreads=workers, server_name='METARMap')
+    if ENABLE_HTTPS:
+        server.ssl_adapter = BuiltinSSLAdapter(SSL_CERT_FILE, SSL_KEY_FILE)
+    app.logger.info(f"Serving on port {port} with {workers} worker threads")
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    serve()
@@ -205,9 +205,12 @@ install_packages() {
         adafruit-circuitpython-neopixel \
         RPi.GPIO \
         flask \
+        cheroot \
         requests \
         pytz \
         astral \
+        numpy \
+        jeepney \
         schedule; then
 
         # Deactivate virtual environment
@@ -681,6 +684,7 @@ After=network.target
 Type=simple
 WorkingDirectory=/home/pi
 ExecStart=/home/pi/${venv_name}/bin/python3 /home/pi/metar.py
+ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 User=root
 StandardOutput=journal
@@ -0,0 +1,39 @@
+// Live updates from the server's /events stream.
+//
+// handlers maps event names ('weather', 'conditions', 'services') to functions
+// that receive the parsed payload. The server sends the current state as soon
+// as the stream opens and then only what changes. If the browser can't open the
+// stream, or the server turns it away, startPolling() is called once instead.
+function subscribeToServerEvents(handlers, startPolling) {
+    let polling = false;
+    function fallBackToPolling() {
+        if (!polling) {
+            polling = true;
+            startPolling();
+        }
+    }
+
+    if (typeof EventSource === 'undefined') {
+        fallBackToPolling();
+        return null;
+    }
+
+    const source = new EventSource('/events');
+    Object.entries(handlers).forEach(([eventName, handler]) => {
+        source.addEventListener(eventName, event => {
+            try {
+                handler(JSON.parse(event.data));
+            } catch (error) {
+                console.error(`Error handling ${eventName} event:`, error);
+            }
+        });
+    });
+    source.onerror = () => {
+        // Dropped streams are retried by the browser; a closed one was refused outright
+        if (source.readyState === EventSource.CLOSED) {
+            fallBackToPolling();
+        }
+    };
+    window.addEventListener('beforeunload', () => source.close());
+    return source;
+}
@@ -243,9 +243,40 @@ document.addEventListener('DOMContentLoaded', function() {
         document.querySelector('.snow-airports').textContent = '';
     }
 
-    // Update lists initially and every minute
+    // Update lists initially
     updateConditionLists();
-    setInterval(updateConditionLists, 60000);
+
+    // Latest condition sets pushed over /events; fetched on demand when the stream isn't available
+    let conditionAirports = null;
+    function getConditionAirports() {
+        if (conditionAirports) {
+            return Promise.resolve(conditionAirports);
+        }
+        return fetch('/kiosk/condition-airports').then(response => response.json());
+    }
+
+    function showConditionAirports(data) {
+        conditionAirports = data;
+        // Refresh the preview if it shows any of the condition sets
+        if (['windy', 'lightning', 'snow'].some(id => document.getElementById(id).checked)) {
+            updatePreview();
+        }
+    }
+
+    function showWeatherUpdated(data) {
+        document.querySelectorAll('#weather-last-updated').forEach(el => {
+            el.textContent = data.formatted_date;
+        });
+        updateWeatherStatus();
+    }
+
+    // Weather time and condition sets are pushed over /events; poll only if the stream isn't available
+    subscribeToServerEvents({
+        weather: showWeatherUpdated,
+        conditions: showConditionAirports
+    }, () => {
+        setInterval(fetchWeatherStatus, 30000); // Update every 30 seconds
+    });
 
     // Add CSS for the condition airport lists
     const style = document.createElement('style');
@@ -276,9 +307,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
         let totalAirports = new Set();
 
-        // Fetch all condition data at once
-        fetch('/kiosk/condition-airports')
-            .then(response => response.json())
+        // Get all condition data at once
+        getConditionAirports()
             .then(data => {
                 // Update windy preview if checked
                 if (document.getElementById('windy').checked) {
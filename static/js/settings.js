@@ -157,20 +157,31 @@ async function updateServiceStatus(serviceName) {
     try {
         const response = await fetch(`/service/status/${serviceName}`);
         const data = await response.json();
-
-        const statusElement = document.getElementById(`${serviceName}-service-status`);
-        const dotElement = statusElement.querySelector('.status-dot');
-        const textElement = statusElement.querySelector('.status-text');
-
-        // Update status dot and text
-        dotElement.className = `status-dot ${data.status}`;
-        textElement.textContent = data.message;
-
+        showServiceStatus(serviceName, data);
     } catch (error) {
         console.error(`Error updating ${serviceName} status:`, error);
     }
 }
 
+// Function to show a service's status ({status, message}) on the page
+function showServiceStatus(serviceName, data) {
+    const statusElement = document.getElementById(`${serviceName}-service-status`);
+    if (!statusElement) {
+        return;
+    }
+    const dotElement = statusElement.querySelector('.status-dot');
+    const textElement = statusElement.querySelector('.status-text');
+
+    // Update status dot and text
+    dotElement.className = `status-dot ${data.status}`;
+    textElement.textContent = data.message;
+}
+
+// Function to show every service in a 'services' event
+function showServiceStatuses(services) {
+    Object.entries(services).forEach(([serviceName, data]) => showServiceStatus(serviceName, data));
+}
+
 // Function to format date as MM-DD-YYYY HH:MM:SS
 function formatDate(dateStr) {
     const date = new Date(dateStr);
@@ -192,97 +203,7 @@ function updateWeatherStatus() {
     isUpdatingWeather = true;
     fetch('/weather-status')
         .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                // Update all instances of the timestamp text
-                const lastUpdatedElements = document.querySelectorAll('#map-weather-last-updated, #update-weather-last-updated');
-                const statusDots = document.querySelectorAll('#map-weather-status-dot, #update-weather-status-dot');
-                
-                // Use the formatted_date if available, otherwise use last_updated
-                const displayDate = data.formatted_date || data.last_updated;
-                
-                lastUpdatedElements.forEach(el => {
-                    el.textContent = displayDate;
-                });
-                
-                try {
-                    const lastUpdated = data.last_updated;
-                    
-                    if (lastUpdated && lastUpdated !== "Weather data not available") {
-                        let updateTime;
-                        try {
-                            const parts = lastUpdated.split(' ');
-                            if (parts.length !== 2) throw new Error('Invalid date format');
-                            
-                            const dateParts = parts[0].split('-');
-                            const timeParts = parts[1].split(':');
-                            
-                            if (dateParts.length !== 3 || timeParts.length !== 3) {
-                                throw new Error('Invalid date/time parts');
-                            }
-                            
-                            // Check if the date is in YYYY-MM-DD format (from API) or MM-DD-YYYY format (from UI)
-                            let year, month, day;
-                            if (dateParts[0].length === 4) {
-                                // YYYY-MM-DD format
-                                year = parseInt(dateParts[0]);
-                                month = parseInt(dateParts[1]) - 1; // 0-indexed month
-                                day = parseInt(dateParts[2]);
-                            } else {
-                                // MM-DD-YYYY format
-                                year = parseInt(dateParts[2]);
-                                month = parseInt(dateParts[0]) - 1; // 0-indexed month
-                                day = parseInt(dateParts[1]);
-                            }
-                            
-                            // Validate parsed values
-                            if (isNaN(year) || isNaN(month) || isNaN(day)) {
-                                throw new Error('Invalid date numbers');
-                            }
-                            
-                            const hour = parseInt(timeParts[0]);
-                            const minute = parseInt(timeParts[1]);
-                            const second = parseInt(timeParts[2]);
-                            
-                            if (isNaN(hour) || isNaN(minute) || isNaN(second)) {
-                                throw new Error('Invalid time numbers');
-                            }
-                            
-                            updateTime = new Date(year, month, day, hour, minute, second);
-                            
-                            if (isNaN(updateTime.getTime())) {
-                                throw new Error('Invalid date object');
-                            }
-                        } catch (dateError) {
-                            console.error('Error parsing date:', dateError);
-                            throw new Error('Failed to parse date: ' + dateError.message);
-                        }
-                        
-                        const now = new Date();
-                        const diffMinutes = (now - updateTime) / (1000 * 60);
-                        
-                        // Use a default threshold if WEATHER_UPDATE_THRESHOLD is not defined
-                        const staleThreshold = typeof WEATHER_UPDATE_THRESHOLD !== 'undefined' ? WEATHER_UPDATE_THRESHOLD : 10;
-                        
-                        // Update all status dots
-                        statusDots.forEach(dot => {
-                            dot.style.backgroundColor = diffMinutes < staleThreshold ? 'green' : 'red';
-                        });
-                    } else {
-                        // If weather data is not available or invalid, set dots to red
-                        statusDots.forEach(dot => {
-                            dot.style.backgroundColor = 'red';
-                        });
-                    }
-                } catch (e) {
-                    console.error("Error processing weather status:", e);
-                    // Set dots to red on error
-                    statusDots.forEach(dot => {
-                        dot.style.backgroundColor = 'red';
-                    });
-                }
-            }
-        })
+        .then(showWeatherStatus)
         .catch(error => {
             console.error('Error fetching weather status:', error);
             // Set dots to red on error
@@ -296,6 +217,101 @@ function updateWeatherStatus() {
         });
 }
 
+// Function to show weather.json's last update time and whether it is stale
+let lastWeatherStatus = null;
+function showWeatherStatus(data) {
+    lastWeatherStatus = data;
+    if (data.success) {
+        // Update all instances of the timestamp text
+        const lastUpdatedElements = document.querySelectorAll('#map-weather-last-updated, #update-weather-last-updated');
+        const statusDots = document.querySelectorAll('#map-weather-status-dot, #update-weather-status-dot');
+        
+        // Use the formatted_date if available, otherwise use last_updated
+        const displayDate = data.formatted_date || data.last_updated;
+        
+        lastUpdatedElements.forEach(el => {
+            el.textContent = displayDate;
+        });
+        
+        try {
+            const lastUpdated = data.last_updated;
+            
+            if (lastUpdated && lastUpdated !== "Weather data not available") {
+                let updateTime;
+                try {
+                    const parts = lastUpdated.split(' ');
+                    if (parts.length !== 2) throw new Error('Invalid date format');
+                    
+                    const dateParts = parts[0].split('-');
+                    const timeParts = parts[1].split(':');
+                    
+                    if (dateParts.length !== 3 || timeParts.length !== 3) {
+                        throw new Error('Invalid date/time parts');
+                    }
+                    
+                    // Check if the date is in YYYY-MM-DD format (from API) or MM-DD-YYYY format (from UI)
+                    let year, month, day;
+                    if (dateParts[0].length === 4) {
+                        // YYYY-MM-DD format
+                        year = parseInt(dateParts[0]);
+                        month = parseInt(dateParts[1]) - 1; // 0-indexed month
+                        day = parseInt(dateParts[2]);
+                    } else {
+                        // MM-DD-YYYY format
+                        year = parseInt(dateParts[2]);
+                        month = parseInt(dateParts[0]) - 1; // 0-indexed month
+                        day = parseInt(dateParts[1]);
+                    }
+                    
+                    // Validate parsed values
+                    if (isNaN(year) || isNaN(month) || isNaN(day)) {
+                        throw new Error('Invalid date numbers');
+                    }
+                    
+                    const hour = parseInt(timeParts[0]);
+                    const minute = parseInt(timeParts[1]);
+                    const second = parseInt(timeParts[2]);
+                    
+                    if (isNaN(hour) || isNaN(minute) || isNaN(second)) {
+                        throw new Error('Invalid time numbers');
+                    }
+                    
+                    updateTime = new Date(year, month, day, hour, minute, second);
+                    
+                    if (isNaN(updateTime.getTime())) {
+                        throw new Error('Invalid date object');
+                    }
+                } catch (dateError) {
+                    console.error('Error parsing date:', dateError);
+                    throw new Error('Failed to parse date: ' + dateError.message);
+                }
+                
+                const now = new Date();
+                const diffMinutes = (now - updateTime) / (1000 * 60);
+                
+                // Use a default threshold if WEATHER_UPDATE_THRESHOLD is not defined
+                const staleThreshold = typeof WEATHER_UPDATE_THRESHOLD !== 'undefined' ? WEATHER_UPDATE_THRESHOLD : 10;
+                
+                // Update all status dots
+                statusDots.forEach(dot => {
+                    dot.style.backgroundColor = diffMinutes < staleThreshold ? 'green' : 'red';
+                });
+            } else {
+                // If weather data is not available or invalid, set dots to red
+                statusDots.forEach(dot => {
+                    dot.style.backgroundColor = 'red';
+                });
+            }
+        } catch (e) {
+            console.error("Error processing weather status:", e);
+            // Set dots to red on error
+            statusDots.forEach(dot => {
+                dot.style.backgroundColor = 'red';
+            });
+        }
+    }
+}
+
 // Function to update all service statuses
 function updateAllServiceStatuses() {
     ['metar', 'settings', 'scheduler'].forEach(service => {
@@ -303,56 +319,114 @@ function updateAllServiceStatuses() {
     });
 }
 
-// Add this at the top with other global variables
-const logIntervals = {};
+// Open log viewers: service name -> { lines, cursor, source, interval }
+const logViewers = {};
+const MAX_LOG_LINES = 200;
 
 function toggleLogs(serviceName) {
     const logsDiv = document.getElementById(`${serviceName}-service-logs`);
     const isVisible = logsDiv.style.display !== 'none';
 
     if (!isVisible) {
-        // Clear any existing interval first
-        if (logIntervals[serviceName]) {
-            clearInterval(logIntervals[serviceName]);
-        }
-
-        // Initial fetch
-        fetchServiceLogs(serviceName);
+        stopLogs(serviceName);
+        logViewers[serviceName] = { lines: [], cursor: null, source: null, interval: null };
+        showLogLines(serviceName);
         logsDiv.style.display = 'block';
-
-        // Start new interval
-        logIntervals[serviceName] = setInterval(() => {
-            fetchServiceLogs(serviceName);
-        }, 5000);
+        followServiceLogs(serviceName);
     } else {
-        // Clear interval when hiding logs
-        if (logIntervals[serviceName]) {
-            clearInterval(logIntervals[serviceName]);
-            delete logIntervals[serviceName];
-        }
+        stopLogs(serviceName);
         logsDiv.style.display = 'none';
     }
 }
 
-// Clean up intervals when leaving the page
+function stopLogs(serviceName) {
+    const viewer = logViewers[serviceName];
+    if (!viewer) {
+        return;
+    }
+    if (viewer.source) {
+        viewer.source.close();
+    }
+    if (viewer.interval) {
+        clearInterval(viewer.interval);
+    }
+    delete logViewers[serviceName];
+}
+
+// Clean up streams and intervals when leaving the page
 window.addEventListener('beforeunload', () => {
-    Object.values(logIntervals).forEach(interval => clearInterval(interval));
+    Object.keys(logViewers).forEach(stopLogs);
 });
 
+// Follow the log live; the server sends the last 200 lines and then each new entry.
+// If the stream can't be opened, poll for entries after the last cursor instead.
+function followServiceLogs(serviceName) {
+    const viewer = logViewers[serviceName];
+    if (typeof EventSource === 'undefined') {
+        pollServiceLogs(serviceName);
+        return;
+    }
+
+    const source = new EventSource(`/service/logs/${serviceName}/stream`);
+    viewer.source = source;
+    source.addEventListener('log', event => {
+        // The browser resends the last event id when it reconnects, so nothing is repeated
+        viewer.cursor = event.lastEventId;
+        appendLogLines(serviceName, JSON.parse(event.data));
+    });
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && logViewers[serviceName] === viewer) {
+            viewer.source = null;
+            pollServiceLogs(serviceName);
+        }
+    };
+}
+
+function pollServiceLogs(serviceName) {
+    const viewer = logViewers[serviceName];
+    fetchServiceLogs(serviceName);
+    viewer.interval = setInterval(() => {
+        fetchServiceLogs(serviceName);
+    }, 5000);
+}
+
 function fetchServiceLogs(serviceName) {
-    fetch(`/service/logs/${serviceName}`)
+    const viewer = logViewers[serviceName];
+    if (!viewer) {
+        return;
+    }
+    const query = viewer.cursor ? `?cursor=${encodeURIComponent(viewer.cursor)}` : '';
+    fetch(`/service/logs/${serviceName}${query}`)
         .then(response => response.json())
         .then(data => {
-            if (data.success) {
-                const logsContent = document.querySelector(`#${serviceName}-service-logs .logs-content`);
-                if (logsContent) {
-                    logsContent.textContent = data.logs || 'No logs available';
-                }
+            if (data.success && logViewers[serviceName] === viewer) {
+                viewer.cursor = data.cursor;
+                appendLogLines(serviceName, data.lines || []);
             }
         })
         .catch(error => console.error('Error fetching logs:', error));
 }
 
+function appendLogLines(serviceName, lines) {
+    const viewer = logViewers[serviceName];
+    if (!viewer || !lines.length) {
+        return;
+    }
+    viewer.lines.push(...lines);
+    if (viewer.lines.length > MAX_LOG_LINES) {
+        viewer.lines.splice(0, viewer.lines.length - MAX_LOG_LINES);
+    }
+    showLogLines(serviceName);
+}
+
+function showLogLines(serviceName) {
+    const logsContent = document.querySelector(`#${serviceName}-service-logs .logs-content`);
+    const viewer = logViewers[serviceName];
+    if (logsContent && viewer) {
+        logsContent.textContent = viewer.lines.length ? viewer.lines.join('\n') : 'No logs available';
+    }
+}
+
 // Function to populate timezone dropdown
 function populateTimezones() {
     const select = document.getElementById('timezone-select');
@@ -1099,6 +1173,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const metarControlBtn = document.getElementById('metar-control-btn');
     const testStatus = document.getElementById('test-status');
     let isTestRunning = false;
+    // True when the running METAR service shows the test colors over its control channel
+    let usingLedControl = false;
 
     const colors = [
         { name: 'Red', color: '#ff0000' },
@@ -1114,46 +1190,32 @@ document.addEventListener('DOMContentLoaded', function() {
     ];
 
     if (runAutoTest && stopAutoTest && metarControlBtn) {
+        function startTestUi() {
+            currentIndex = -1; // Reset to start
+            isTestRunning = true;
+            // Update button states
+            runAutoTest.textContent = 'Next Color';
+            stopAutoTest.style.visibility = 'visible';
+            metarControlBtn.style.visibility = 'hidden';
+            showNextColor();
+        }
+
         runAutoTest.addEventListener('click', function() {
             if (!isTestRunning) {
-                // First check if METAR service is running and stop it if needed
-                fetch('/service/status/metar')
+                // If the METAR service is running it can show the test colors itself
+                fetch('/led-control/status')
                     .then(response => response.json())
                     .then(data => {
-                        if (data.status === 'running') {
-                            // Stop METAR service first
-                            return fetch('/service/control/metar/stop', {
-                                method: 'POST',
-                            }).then(() => {
-                                showToast('METAR service stopped', 'info');
-                            });
-                        }
-                    })
-                    .then(() => {
-                        // Start the LED test service
-                        return fetch('/led-test-service/start', {
-                            method: 'POST',
-                            headers: {
-                                'Content-Type': 'application/json'
-                            }
-                        });
-                    })
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.success) {
-                            currentIndex = -1; // Reset to start
-                            isTestRunning = true;
-                            // Update button states
-                            runAutoTest.textContent = 'Next Color';
-                            stopAutoTest.style.visibility = 'visible';
-                            metarControlBtn.style.visibility = 'hidden';
-                            showNextColor();
+                        usingLedControl = data.available;
+                        if (usingLedControl) {
+                            startTestUi();
                         } else {
-                            showToast('Failed to start LED test service: ' + data.error, 'danger');
+                            startTestWithService();
                         }
                     })
-                    .catch(error => {
-                        showToast('Error starting LED test service: ' + error, 'danger');
+                    .catch(() => {
+                        usingLedControl = false;
+                        startTestWithService();
                     });
             } else {
                 // Just show next color if test is already running
@@ -1161,6 +1223,42 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
 
+        function startTestWithService() {
+            // First check if METAR service is running and stop it if needed
+            fetch('/service/status/metar')
+                .then(response => response.json())
+                .then(data => {
+                    if (data.status === 'running') {
+                        // Stop METAR service first
+                        return fetch('/service/control/metar/stop', {
+                            method: 'POST',
+                        }).then(() => {
+                            showToast('METAR service stopped', 'info');
+                        });
+                    }
+                })
+                .then(() => {
+                    // Start the LED test service
+                    return fetch('/led-test-service/start', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json'
+                        }
+                    });
+                })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        startTestUi();
+                    } else {
+                        showToast('Failed to start LED test service: ' + data.error, 'danger');
+                    }
+                })
+                .catch(error => {
+                    showToast('Error starting LED test service: ' + error, 'danger');
+                });
+        }
+
         stopAutoTest.addEventListener('click', stopTest);
         
         function stopTest() {
@@ -1177,6 +1275,24 @@ document.addEventListener('DOMContentLoaded', function() {
             currentIndex = -1;
             testStatus.textContent = 'Testing: Not Started';
 
+            if (usingLedControl) {
+                // The METAR service never stopped - hand the LEDs back to the weather display
+                usingLedControl = false;
+                fetch('/led-control/resume', { method: 'POST' })
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.success) {
+                            showToast('Test stopped', 'success');
+                        } else {
+                            showToast('Failed to resume the METAR display: ' + data.error, 'danger');
+                        }
+                    })
+                    .catch(error => {
+                        showToast('Error resuming the METAR display: ' + error, 'danger');
+                    });
+                return;
+            }
+
             // Create a promise for stopping the service
             const stopServicePromise = fetch('/led-test-service/stop', {
                 method: 'POST',
@@ -1381,9 +1497,22 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Initialize all status updates
     updateAllServiceStatuses();
-    
-    // Set up intervals for status updates
-    setInterval(updateAllServiceStatuses, 10000);  // Update service statuses every 10 seconds
+
+    // Weather and service status are pushed over /events; poll only if the stream isn't available
+    subscribeToServerEvents({
+        weather: showWeatherStatus,
+        services: showServiceStatuses
+    }, () => {
+        setInterval(updateAllServiceStatuses, 10000);  // Update service statuses every 10 seconds
+        setInterval(updateWeatherStatus, 30000);  // Update weather status every 30 seconds
+    });
+
+    // Re-check the last update time as it ages, so the dot turns red without a new event
+    setInterval(() => {
+        if (lastWeatherStatus) {
+            showWeatherStatus(lastWeatherStatus);
+        }
+    }, 30000);
    
     // Initialize timezone dropdown
     populateTimezones();
@@ -0,0 +1,70 @@
+"""Tests for deadlines.DeadlineScheduler, run with `python -m unittest test_deadlines`."""
+
+import logging
+import unittest
+
+from deadlines import DeadlineScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RunPendingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = DeadlineScheduler(clock=self.clock, retry_delay=5)
+        logging.disable(logging.ERROR)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def failing(self):
+        self.calls += 1
+        raise RuntimeError("boom")
+
+    def test_failing_one_shot_event_is_dropped(self):
+        self.calls = 0
+        self.scheduler.call_later(0, 'stale', self.failing)
+        self.scheduler.run_pending()
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(self.scheduler.pending('stale'))
+
+        self.clock.now += 60
+        self.scheduler.run_pending()
+        self.assertEqual(self.calls, 1)
+
+    def test_failing_retry_event_runs_again_after_retry_delay(self):
+        self.calls = 0
+        self.scheduler.call_later(0, 'weather', self.failing, retry=True)
+        self.scheduler.run_pending()
+        self.assertTrue(self.scheduler.pending('weather'))
+        self.assertEqual(self.scheduler.next_deadline(), 5)
+
+        self.clock.now = 5
+        self.scheduler.run_pending()
+        self.assertEqual(self.calls, 2)
+        self.assertTrue(self.scheduler.pending('weather'))
+
+    def test_periodic_event_keeps_retry_after_rescheduling(self):
+        results = iter([10, RuntimeError("boom")])
+
+        def periodic():
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.scheduler.call_later(0, 'lights', periodic, retry=True)
+        self.scheduler.run_pending()
+        self.clock.now = 10
+        self.scheduler.run_pending()
+        self.assertTrue(self.scheduler.pending('lights'))
+        self.assertEqual(self.scheduler.next_deadline(), 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,26 @@
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 from config import *
+import config
 import json
 import re
 import datetime
 import os
+import time
+import functools
+import importlib
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+from file_watch import FileWatcher, MODIFIED
+
+try:
+    import msgpack
+except ImportError:  # The binary snapshot is optional; weather.json is always written
+    msgpack = None
 
 # Configure logging
 logging.basicConfig(
@@ -30,43 +46,338 @@ def get_airports_with_skip(file_path):
         logging.error("Failed to read the airport file: %s", e)
         return []
 
+class AirportLayout:
+    """
+    In-memory copy of airports.txt mapping LED index to airport code and airport
+    code to LED indices. The file is only re-read when its mtime or size changes.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.airports = []   # LED index -> airport code, including 'SKIP' entries
+        self.indices = {}    # Airport code -> list of LED indices
+        self.version = 0     # Bumped every time the layout is reloaded
+        self._file_stamp = None
+        self.refresh()
+
+    def refresh(self):
+        """Reload the layout if the file changed on disk. Returns True if it was reloaded."""
+        try:
+            stat = os.stat(self.file_path)
+            file_stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logging.error("Failed to read the airport file: %s", e)
+            file_stamp = None
+
+        if file_stamp == self._file_stamp and self.version:
+            return False
+
+        self._file_stamp = file_stamp
+        self.airports = get_airports_with_skip(self.file_path) if file_stamp else []
+        indices = {}
+        for index, airport_code in enumerate(self.airports):
+            if airport_code != "SKIP":
+                indices.setdefault(airport_code, []).append(index)
+        self.indices = indices
+        self.version += 1
+        logging.info(f"Loaded LED layout from {self.file_path}: {len(self.airports)} LEDs, {len(indices)} airports")
+        return True
+
+    def leds_for(self, airport_codes):
+        """Return (index, airport_code) pairs, in LED order, for the airports in airport_codes."""
+        return sorted(
+            (index, airport_code)
+            for airport_code in airport_codes
+            for index in self.indices.get(airport_code, ())
+        )
+
+WEATHER_FILE = '/home/pi/weather.json'
+# Optional msgpack copy of weather.json, written when config.WEATHER_SNAPSHOT is enabled
+WEATHER_SNAPSHOT_FILE = '/home/pi/weather.msgpack'
+# Per-station last_seen times, kept current on cycles where weather.json itself isn't rewritten
+WEATHER_SEEN_FILE = '/home/pi/weather_seen.json'
+METAR_API_URL = "https://aviationweather.gov/api/data/metar"
+METAR_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
+METAR_REQUEST_TIMEOUT = 30
+
+# Returned by fetch_metar when the API reports the data has not changed (HTTP 304)
+NOT_MODIFIED = object()
+
+# Shared HTTP session so long-running callers (the scheduler) reuse the TCP/TLS connection
+_session = None
+
+# Cache validators from the last successful response, keyed by the requested ids string
+_validators = {}
+
+# Features from the last good response for each chunk, reused when a chunk answers 304
+_chunk_features = {}
+
+def get_session():
+    """Return the shared requests session, creating it on first use."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        pool_size = max(4, getattr(config, 'METAR_FETCH_WORKERS', 4))
+        _session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        _session.headers.update({'User-Agent': METAR_USER_AGENT})
+    return _session
+
+def touch_weather_file():
+    """Bump the weather.json timestamp without rewriting it (used when the API reports no change)."""
+    try:
+        os.utime(WEATHER_FILE, None)
+        logging.info(f"Weather data unchanged, refreshed timestamp on {WEATHER_FILE}")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to update timestamp on {WEATHER_FILE}: {e}")
+        return False
+
+def write_last_seen(weather_data):
+    """
+    Save each station's last_seen time to WEATHER_SEEN_FILE. Used when the
+    observations are unchanged and weather.json is only touched, so a restarted
+    scheduler doesn't expire stations that were still being reported.
+    """
+    try:
+        last_seen = {code: info['last_seen'] for code, info in weather_data.items() if 'last_seen' in info}
+        _atomic_write(WEATHER_SEEN_FILE, json.dumps(last_seen, separators=(',', ':')).encode('utf-8'))
+        return True
+    except Exception as e:
+        logging.error(f"Failed to write {WEATHER_SEEN_FILE}: {e}")
+        return False
+
+def load_last_seen():
+    """Return the station -> last_seen times saved by write_last_seen, or {} if there are none."""
+    try:
+        with open(WEATHER_SEEN_FILE, 'r') as seen_file:
+            return json.load(seen_file)
+    except (OSError, ValueError):
+        return {}
+
+def _atomic_write(file_path, payload):
+    """
+    Write bytes to file_path so readers only ever see the old or the new file.
+
+    The data goes to a temp file in the same directory, is fsynced and then
+    renamed over the target. The existing file's mode and owner are kept.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    try:
+        previous = os.stat(file_path)
+    except OSError:
+        previous = None
+
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(payload)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.chmod(temp_path, previous.st_mode & 0o777 if previous else 0o644)
+        if previous is not None:
+            try:
+                # metar.py runs as root; keep the file owned by whoever owned it before
+                os.chown(temp_path, previous.st_uid, previous.st_gid)
+            except OSError:
+                pass
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+def write_weather_data(weather_data):
+    """
+    Atomically write weather.json (compact, no indentation).
+
+    When config.WEATHER_SNAPSHOT is enabled and msgpack is installed, a binary
+    snapshot is written next to it carrying a digest of the JSON it matches, so
+    load_weather_file() can skip the JSON parse.
+
+    Returns:
+        bool: True if weather.json was written
+    """
+    try:
+        payload = json.dumps(weather_data, separators=(',', ':')).encode('utf-8')
+        _atomic_write(WEATHER_FILE, payload)
+        logging.info(f"Weather data saved to {WEATHER_FILE} ({len(payload)} bytes)")
+    except Exception as e:
+        logging.error(f"Failed to write weather data to file: {e}")
+        return False
+
+    if getattr(config, 'WEATHER_SNAPSHOT', False):
+        if msgpack is None:
+            logging.warning("WEATHER_SNAPSHOT is enabled but msgpack is not installed; skipping the snapshot")
+        else:
+            try:
+                snapshot = msgpack.packb({
+                    'digest': hashlib.sha1(payload).hexdigest(),
+                    'data': weather_data
+                }, use_bin_type=True)
+                _atomic_write(WEATHER_SNAPSHOT_FILE, snapshot)
+            except Exception as e:
+                logging.error(f"Failed to write weather snapshot: {e}")
+    return True
+
+def load_weather_file(file_path=None):
+    """
+    Read weather.json, using the msgpack snapshot instead of parsing the JSON
+    when the snapshot was written from exactly this weather.json.
+
+    Args:
+        file_path: JSON file to read (defaults to WEATHER_FILE; only WEATHER_FILE has a snapshot)
+
+    Raises:
+        OSError, ValueError: If the file is missing or unreadable
+    """
+    file_path = file_path or WEATHER_FILE
+    with open(file_path, 'rb') as json_file:
+        payload = json_file.read()
+
+    if file_path == WEATHER_FILE and msgpack is not None and getattr(config, 'WEATHER_SNAPSHOT', False):
+        try:
+            with open(WEATHER_SNAPSHOT_FILE, 'rb') as snapshot_file:
+                snapshot = msgpack.unpackb(snapshot_file.read(), raw=False)
+            if snapshot.get('digest') == hashlib.sha1(payload).hexdigest():
+                return snapshot['data']
+        except Exception:
+            pass  # Missing or out of date - fall back to the JSON
+
+    return json.loads(payload)
+
 def fetch_metar():
-    """Fetch METAR data from aviation weather API."""
+    """Fetch METAR data from aviation weather API.
+
+    Returns the parsed GeoJSON dict, NOT_MODIFIED if the API answered 304 to our
+    conditional request, or None on failure. When METAR_CHUNK_SIZE is set and the
+    airport list is longer than it, the list is fetched in concurrent chunks.
+    """
     airport_ids = get_valid_airports(AIRPORTS_FILE)
     if not airport_ids:
         logging.error("No valid airport IDs found in airport file")
         return None
 
-    base_url = "https://aviationweather.gov/api/data/metar"
+    chunk_size = getattr(config, 'METAR_CHUNK_SIZE', 0)
+    if chunk_size and len(airport_ids) > chunk_size:
+        return fetch_metar_chunked(airport_ids, chunk_size)
+
+    return _request_metar(airport_ids, conditional=os.path.exists(WEATHER_FILE))
+
+def fetch_metar_chunked(airport_ids, chunk_size):
+    """Fetch METAR data in chunks of chunk_size airports on a small thread pool.
+
+    The features of every chunk are merged into one GeoJSON dict so the result can
+    be handed straight to parse_weather. A failed chunk only drops its own airports.
+    """
+    chunks = [airport_ids[i:i + chunk_size] for i in range(0, len(airport_ids), chunk_size)]
+    workers = max(1, min(getattr(config, 'METAR_FETCH_WORKERS', 4), len(chunks)))
+    weather_file_exists = os.path.exists(WEATHER_FILE)
+
+    logging.info(f"Fetching {len(airport_ids)} airports in {len(chunks)} chunks of up to {chunk_size} using {workers} workers")
+
+    def fetch_chunk(chunk):
+        # Only go conditional when we still hold the features a 304 would refer to
+        conditional = weather_file_exists and ','.join(chunk) in _chunk_features
+        start_time = time.monotonic()
+        result = _request_metar(chunk, conditional=conditional)
+        return result, time.monotonic() - start_time
+
+    start_time = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(fetch_chunk, chunks))
+    total_elapsed = time.monotonic() - start_time
+
+    features = []
+    unchanged_chunks = 0
+    failed_chunks = 0
+    for number, (chunk, (result, elapsed)) in enumerate(zip(chunks, results), start=1):
+        ids = ','.join(chunk)
+        if result is NOT_MODIFIED:
+            unchanged_chunks += 1
+            chunk_features = _chunk_features.get(ids, [])
+            status = "not modified"
+        elif result and 'features' in result:
+            chunk_features = result['features']
+            _chunk_features[ids] = chunk_features
+            status = "ok"
+        else:
+            failed_chunks += 1
+            chunk_features = []
+            _chunk_features.pop(ids, None)
+            status = "FAILED"
+        features.extend(chunk_features)
+        logging.info(f"Chunk {number}/{len(chunks)} ({len(chunk)} airports): {status} in {elapsed:.2f}s, {len(chunk_features)} features")
+
+    logging.info(f"Chunked fetch finished in {total_elapsed:.2f}s: {len(chunks) - unchanged_chunks - failed_chunks} updated, {unchanged_chunks} unchanged, {failed_chunks} failed")
+
+    if failed_chunks == len(chunks):
+        logging.error("All METAR chunks failed")
+        return None
+    if unchanged_chunks == len(chunks):
+        return NOT_MODIFIED
+    if failed_chunks:
+        logging.warning(f"{failed_chunks} chunk(s) failed - their airports will be missing from this update")
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+def _request_metar(airport_ids, conditional=False):
+    """Request METAR data for a list of airport IDs in a single API call.
+
+    Returns the parsed GeoJSON dict, NOT_MODIFIED on a 304, or None on failure.
+    """
+    ids = ','.join(airport_ids)
     params = {
-        'ids': ','.join(airport_ids),
+        'ids': ids,
         'format': 'geojson'
     }
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
-    }
+    headers = {}
+    validators = _validators.get(ids) if conditional else None
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
 
-    logging.info(f"Sending request with User-Agent: {headers['User-Agent']}")
+    session = get_session()
+    logging.info(f"Sending request with User-Agent: {session.headers['User-Agent']}")
 
     try:
         # Construct the full URL for debugging
-        full_url = f"{base_url}?ids={','.join(airport_ids)}&format=geojson"
-        logging.info(f"Making API request to {base_url} with {len(airport_ids)} airports")
+        full_url = f"{METAR_API_URL}?ids={ids}&format=geojson"
+        logging.info(f"Making API request to {METAR_API_URL} with {len(airport_ids)} airports")
         logging.info(f"Full URL: {full_url}")
         logging.info(f"Request parameters: {params}")
+        if headers:
+            logging.info(f"Conditional request headers: {headers}")
         
         start_time = datetime.datetime.now()
-        # Pass the 'headers' dictionary to the request
-        response = requests.get(base_url, params=params, headers=headers)
+        response = session.get(METAR_API_URL, params=params, headers=headers, timeout=METAR_REQUEST_TIMEOUT)
         elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
         
         logging.info(f"API response received in {elapsed_time:.2f} seconds. Status code: {response.status_code}")
         
         # Log response headers to check for rate limiting
-        important_headers = ['content-type', 'content-length', 'date', 'x-rate-limit', 'retry-after']
+        important_headers = ['content-type', 'content-length', 'date', 'x-rate-limit', 'retry-after', 'etag', 'last-modified']
         header_info = {k: v for k, v in response.headers.items() if k.lower() in important_headers}
         logging.info(f"Response headers: {header_info}")
+
+        if response.status_code == 304:
+            logging.info("API returned 304 Not Modified - keeping existing weather data")
+            _store_validators(ids, response)
+            return NOT_MODIFIED
         
         # Handle new API response codes
         if response.status_code == 204:
@@ -82,6 +393,7 @@ def fetch_metar():
             logging.info(f"Successfully retrieved data for {airport_count} airports")
             if airport_count == 0:
                 logging.warning("API returned 0 airports - response may be empty despite 200 status")
+            _store_validators(ids, response)
         else:
             logging.warning(f"Response is missing 'features' key. Raw response preview: {str(response.text)[:200]}...")
             
@@ -98,79 +410,279 @@ def fetch_metar():
         logging.error(f"Raw response preview: {response.text[:500]}")
         return None
 
-def read_weather_data():
-    """Read and return the weather data from weather.json."""
-    try:
-        # Use absolute path to ensure consistency
-        with open('/home/pi/weather.json', 'r') as json_file:
-            data = json.load(json_file)
-            return data
-    except Exception as e:
-        logging.error(f"Failed to read weather.json: {e}")
-        return {}
+def _store_validators(ids, response):
+    """Remember the ETag/Last-Modified of a response for the next conditional request."""
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        previous = _validators.get(ids, {})
+        _validators[ids] = {
+            'etag': etag or previous.get('etag'),
+            'last_modified': last_modified or previous.get('last_modified')
+        }
+    elif response.status_code != 304:
+        _validators.pop(ids, None)
 
-def get_windy_airports(weather_data):
-    """Detect and return a dictionary of windy airports with their corresponding colors."""
-    windy_airports = {}
-    for airport_code, weather_info in weather_data.items():
-        wind_speed = weather_info.get('wind_speed', 0)
-        wind_gust = weather_info.get('wind_gust', 0)
-        flt_cat = weather_info.get('flt_cat', 'MISSING')
-        
-        # Ensure wind values are not None before comparison
-        wind_speed = wind_speed if wind_speed is not None else 0
-        wind_gust = wind_gust if wind_gust is not None else 0
+class WeatherCache:
+    """
+    Parsed weather.json kept in memory and shared by every reader in the process.
 
-        # Check if wind speed or wind gust exceeds the threshold
-        if wind_speed > WIND_THRESHOLD or wind_gust > WIND_THRESHOLD:
-            # Get the color based on flight category
-            flt_cat_color = get_flt_cat_color(flt_cat)
+    The file is only parsed again after it has been rewritten (inotify
+    IN_CLOSE_WRITE/IN_MOVED_TO, or an mtime/size change where inotify isn't
+    available). version goes up by one on every reload, so readers can skip
+    work when it hasn't moved.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.data = {}
+        self.version = 0
+        self._watcher = None
+        self._reload = True  # Set until a load succeeds, so failed reads are retried
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the data if the file changed. Returns True if it was reloaded."""
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = FileWatcher(self.file_path)
+            elif self._watcher.check(timeout=0) == MODIFIED:
+                self._reload = True
+            if not self._reload:
+                return False
+            try:
+                data = load_weather_file(self.file_path)
+            except Exception as e:
+                logging.error(f"Failed to read weather.json: {e}")
+                return False
+            self.data = data
+            self.version += 1
+            self._reload = False
+            return True
 
-            # Add airport and color to windy_airports dictionary
-            windy_airports[airport_code] = flt_cat_color
+    def get(self):
+        """Return the current weather data, reloading it first if the file changed."""
+        self.refresh()
+        return self.data
 
-    return windy_airports
+    def snapshot(self):
+        """Return (version, data) as a consistent pair, reloading first if the file changed."""
+        self.refresh()
+        with self._lock:
+            return self.version, self.data
 
-LIGHTNING_KEYWORDS = ["TS", "LTG", "VCTS"]
+weather_cache = WeatherCache(WEATHER_FILE)
 
-def get_lightning_airports(weather_data):
-    """Detect and return a dictionary of airports with lightning and their corresponding colors."""
-    lightning_airports = {}
-    for airport_code, weather_info in weather_data.items():
-        # Use raw_observation as the standard key name
-        raw_observation = weather_info.get('raw_observation', '')
-        flt_cat = weather_info.get('flt_cat', 'MISSING')
+def read_weather_data():
+    """
+    Return the weather data from weather.json.
 
-        # Check for lightning using regular expressions for whole word matching
-        if any(re.search(rf'\b{keyword}\b', raw_observation) for keyword in LIGHTNING_KEYWORDS):
-            # Get the color based on flight category
-            flt_cat_color = get_flt_cat_color(flt_cat)
+    The dict is shared through weather_cache and only re-parsed when the file
+    changes, so callers must not modify it. Returns {} if the file has never
+    been read successfully.
+    """
+    return weather_cache.get()
 
-            # Add airport and color to lightning_airports dictionary
-            lightning_airports[airport_code] = flt_cat_color
+def get_windy_airports(weather_data):
+    """Detect and return a dictionary of windy airports with their corresponding colors."""
+    return get_condition_index(weather_data)['windy']
 
-    return lightning_airports
+LIGHTNING_KEYWORDS = ["TS", "LTG", "VCTS"]
+
+def get_lightning_airports(weather_data):
+    """Detect and return a dictionary of airports with lightning and their corresponding colors."""
+    return get_condition_index(weather_data)['lightning']
 
 SNOW_KEYWORDS = ["SN", "BLSN", "DRSN", "GS", "SG", "SNINCR", "SP"]
 
 def get_snowy_airports(weather_data):
     """Detect and return a dictionary of airports with snow and their corresponding colors."""
-    snowy_airports = {}
+    return get_condition_index(weather_data)['snowy']
+
+def get_station_conditions(airport_weather):
+    """
+    Work out the condition flags that need a scan of one station's raw observation.
+
+    parse_weather stores these on every station so readers don't have to rescan
+    the raw observation on each display cycle. This is deliberately narrower than
+    storing every condition: windy membership and the display color are not
+    stored, because they depend on WIND_THRESHOLD and the *_COLOR settings, which
+    can change (and be reloaded) while weather.json is still current. Those are
+    worked out by get_condition_index, once per data set rather than per read.
+    """
+    # Lightning and snow keywords are matched as whole words by the tokenizer
+    record = tokenize_metar(airport_weather.get('raw_observation', ''))
+
+    return {
+        "lightning": record.lightning,
+        "snowy": record.snow
+    }
+
+def reload_config():
+    """
+    Re-read config.py and refresh the settings this module imported from it.
+
+    `from config import *` copies the values once at import, so reloading the
+    config module alone leaves this module using the old thresholds and colors.
+    """
+    global _condition_index_cache, config_version
+    importlib.reload(config)
+    globals().update({name: value for name, value in vars(config).items() if name.isupper()})
+    _condition_index_cache = (None, None)
+    config_version += 1
+
+# Bumped by reload_config, so caches of config-dependent results (condition sets, colors) can key on it
+config_version = 0
+
+# The last weather data passed to get_condition_index and its index. Holding the
+# reference keeps the identity check below safe from id() reuse.
+_condition_index_cache = (None, None)
+
+def get_condition_index(weather_data):
+    """
+    Return the condition sets for weather_data, computed once per data set.
+
+    Lightning and snow come from the flags parse_weather stored; windy and the
+    colors are worked out here from the current config (see get_station_conditions).
+
+    Returns:
+        dict: 'windy', 'lightning' and 'snowy' map airport codes to their flight category
+              color; 'missing' is a list of airports without a flight category.
+    """
+    global _condition_index_cache
+    cached_data, cached_index = _condition_index_cache
+    if cached_data is weather_data:
+        return cached_index
+
+    index = {'windy': {}, 'lightning': {}, 'snowy': {}, 'missing': []}
     for airport_code, weather_info in weather_data.items():
-        # Use raw_observation as the standard key name
-        raw_observation = weather_info.get('raw_observation', '')
+        # Files written by parse_weather carry the keyword flags; older ones (which already had
+        # 'lightning' but not 'snowy') are worked out here. Wind and color depend on config,
+        # so they are always worked out from the current values.
+        conditions = weather_info if 'snowy' in weather_info else get_station_conditions(weather_info)
         flt_cat = weather_info.get('flt_cat', 'MISSING')
+        color = get_flt_cat_color(flt_cat)
+        wind_speed = weather_info.get('wind_speed') or 0
+        wind_gust = weather_info.get('wind_gust') or 0
+        if wind_speed > WIND_THRESHOLD or wind_gust > WIND_THRESHOLD:
+            index['windy'][airport_code] = color
+        if conditions.get('lightning'):
+            index['lightning'][airport_code] = color
+        if conditions.get('snowy'):
+            index['snowy'][airport_code] = color
+        if flt_cat == 'MISSING':
+            index['missing'].append(airport_code)
+
+    _condition_index_cache = (weather_data, index)
+    return index
+
+
+class MetarRecord(NamedTuple):
+    """Fields pulled out of a raw METAR string by tokenize_metar."""
+    visibility: Optional[float]           # Statute miles, None if not reported
+    ceiling_layers: Tuple[int, ...]       # BKN/OVC layer heights in feet AGL, in report order
+    weather_groups: Tuple[str, ...]       # Present weather groups before RMK (e.g. '-SN', 'VCTS', 'BR')
+    wind_direction: Optional[str]         # Degrees as a string, or 'VRB'
+    wind_speed: Optional[int]             # Knots
+    wind_gust: Optional[int]              # Knots, None if no gust reported
+    lightning: bool                       # Any LIGHTNING_KEYWORDS word present
+    snow: bool                            # Any SNOW_KEYWORDS word present
+
+    @property
+    def ceiling(self):
+        """Lowest BKN/OVC layer in feet AGL, or None if there is no ceiling."""
+        return min(self.ceiling_layers) if self.ceiling_layers else None
+
+EMPTY_METAR_RECORD = MetarRecord(None, (), (), None, None, None, False, False)
+
+# One pattern per whitespace token: visibility, cloud layer, wind or present weather
+_METAR_TOKEN_RE = re.compile(
+    r'(?P<vis>\d{1,2}|\d/\d|M\d/\d)SM'
+    r'|(?P<cover>FEW|SCT|BKN|OVC|VV)(?P<height>\d{3})?(?:CB|TCU)?'
+    r'|(?P<wdir>\d{3}|VRB)(?P<wspd>\d{2,3})(?:G(?P<wgst>\d{2,3}))?KT'
+    r'|(?P<wx>(?:\+|-|VC)?(?:MI|PR|BC|DR|BL|SH|TS|FZ)?'
+    r'(?:DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PY|PO|SQ|FC|SS|DS)*)$'
+)
+
+# Whole-word runs, equivalent to matching each keyword with \b...\b
+_METAR_WORD_RE = re.compile(r'\w+')
+
+_LIGHTNING_WORDS = frozenset(LIGHTNING_KEYWORDS)
+_SNOW_WORDS = frozenset(SNOW_KEYWORDS)
+
+# Every keyword above contains one of these, so most observations can skip the word scan
+_KEYWORD_HINTS = ('TS', 'LTG', 'SN', 'GS', 'SG', 'SP')
+
+@functools.lru_cache(maxsize=4096)
+def tokenize_metar(raw_metar):
+    """
+    Walk a raw METAR string once and return a MetarRecord.
+
+    Results are cached by string, so repeated lookups for the same observation
+    (every display cycle until the next fetch) cost a dict hit.
+
+    Args:
+        raw_metar: Raw METAR string
 
-        # Check for snow using regular expressions for whole word matching
-        if any(re.search(rf'\b{keyword}\b', raw_observation) for keyword in SNOW_KEYWORDS):
-            # Get the color based on flight category
-            flt_cat_color = get_flt_cat_color(flt_cat)
+    Returns:
+        MetarRecord: Parsed fields, or EMPTY_METAR_RECORD if raw_metar is not a string
+    """
+    if not raw_metar or not isinstance(raw_metar, str):
+        return EMPTY_METAR_RECORD
 
-            # Add airport and color to snowy_airports dictionary
-            snowy_airports[airport_code] = flt_cat_color
+    visibility = None
+    ceiling_layers = []
+    weather_groups = []
+    wind_direction = wind_speed = wind_gust = None
+    in_remarks = False
 
-    return snowy_airports
+    for token in raw_metar.split():
+        if token == 'RMK':
+            in_remarks = True
+            continue
+        match = _METAR_TOKEN_RE.match(token)
+        if not match:
+            continue
+        if match.group('vis'):
+            # First visibility group wins
+            if visibility is None:
+                vis_str = match.group('vis')
+                if vis_str.startswith('M'):
+                    # Less than format (e.g., M1/4)
+                    vis_str = vis_str[1:]
+                if '/' in vis_str:
+                    numerator, denominator = vis_str.split('/')
+                    visibility = float(numerator) / float(denominator)
+                else:
+                    visibility = float(vis_str)
+        elif match.group('cover'):
+            # Only BKN and OVC layers count as ceilings
+            height = match.group('height')
+            if match.group('cover') in ('BKN', 'OVC') and height:
+                ceiling_layers.append(int(height) * 100)
+        elif match.group('wspd'):
+            if wind_speed is None:
+                wind_direction = match.group('wdir')
+                wind_speed = int(match.group('wspd'))
+                wind_gust = int(match.group('wgst')) if match.group('wgst') else None
+        elif not in_remarks:
+            weather_groups.append(token)
 
+    if any(hint in raw_metar for hint in _KEYWORD_HINTS):
+        words = set(_METAR_WORD_RE.findall(raw_metar))
+    else:
+        words = ()
+
+    return MetarRecord(
+        visibility=visibility,
+        ceiling_layers=tuple(ceiling_layers),
+        weather_groups=tuple(weather_groups),
+        wind_direction=wind_direction,
+        wind_speed=wind_speed,
+        wind_gust=wind_gust,
+        lightning=not _LIGHTNING_WORDS.isdisjoint(words),
+        snow=not _SNOW_WORDS.isdisjoint(words)
+    )
 
 def determine_flight_category(raw_metar):
     """
@@ -187,8 +699,9 @@ def determine_flight_category(raw_metar):
     
     try:
         # Parse visibility and ceiling from METAR
-        visibility = _parse_visibility(raw_metar)
-        ceiling = _parse_ceiling(raw_metar)
+        record = tokenize_metar(raw_metar)
+        visibility = record.visibility
+        ceiling = record.ceiling
         
         # If visibility is missing, cannot determine flight category
         if visibility is None:
@@ -232,34 +745,7 @@ def _parse_visibility(raw_metar):
     Returns:
         float: Visibility in statute miles, or None if not found
     """
-    try:
-        # Visibility pattern: Must end with SM (statute miles)
-        visibility_pattern = re.compile(r'(\d{1,2}|\d/\d|M\d/\d)SM')
-        
-        parts = raw_metar.split()
-        for part in parts:
-            vis_match = visibility_pattern.match(part)
-            if vis_match:
-                vis_str = vis_match.group(1)  # Get the visibility value
-                
-                # Handle different visibility formats
-                if vis_str.startswith('M'):
-                    # Less than format (e.g., M1/4)
-                    vis_str = vis_str[1:]  # Remove M
-                
-                if '/' in vis_str:
-                    # Fractional visibility (e.g., 1/4)
-                    numerator, denominator = vis_str.split('/')
-                    return float(numerator) / float(denominator)
-                else:
-                    # Integer visibility
-                    return float(vis_str)
-        
-        return None
-        
-    except Exception as e:
-        logging.error(f"Error parsing visibility from METAR: {e}")
-        return None
+    return tokenize_metar(raw_metar).visibility
 
 
 def _parse_ceiling(raw_metar):
@@ -272,29 +758,7 @@ def _parse_ceiling(raw_metar):
     Returns:
         int: Ceiling height in feet AGL, or None if no ceiling
     """
-    try:
-        # Cloud pattern: FEW/SCT/BKN/OVC/VV followed by altitude
-        cloud_pattern = re.compile(r'(FEW|SCT|BKN|OVC|VV)(\d{3})?(CB|TCU)?')
-        
-        parts = raw_metar.split()
-        ceiling_layers = []
-        
-        for part in parts:
-            cloud_match = cloud_pattern.match(part)
-            if cloud_match:
-                type_str, altitude_str, cloud_type = cloud_match.groups()
-                
-                # Only BKN and OVC layers count as ceilings
-                if type_str in ['BKN', 'OVC'] and altitude_str:
-                    altitude = int(altitude_str) * 100  # Convert to feet
-                    ceiling_layers.append(altitude)
-        
-        # Return the lowest ceiling (most restrictive)
-        return min(ceiling_layers) if ceiling_layers else None
-        
-    except Exception as e:
-        logging.error(f"Error parsing ceiling from METAR: {e}")
-        return None
+    return tokenize_metar(raw_metar).ceiling
 
 
 def get_flt_cat_color(flt_cat):
@@ -329,8 +793,8 @@ def get_airport_weather(airport_code, weather_data):
 
     # Use raw_observation as the standard key name
     raw_observation = airport_weather.get('raw_observation', '')
-    # Check for lightning using the defined keywords
-    lightning = any(keyword in raw_observation for keyword in LIGHTNING_KEYWORDS)
+    # Check for lightning using the same whole-word match as the animations
+    lightning = tokenize_metar(raw_observation).lightning
 
     return flt_cat, wind_speed, wind_gust, lightning
 
@@ -351,7 +815,7 @@ def parse_weather(metar_data):
         lon = coords[0] if len(coords) >= 2 else None
 
         # Check for lightning indicators in raw observation
-        lightning = any(keyword in raw_observation for keyword in LIGHTNING_KEYWORDS)
+        lightning = tokenize_metar(raw_observation).lightning
 
         # Handle None values from API - convert to 0 for numeric fields
         def safe_get_numeric(properties, key, default=0):
@@ -403,6 +867,8 @@ def parse_weather(metar_data):
             "longitude": lon,  # Add longitude
             "site": feature['properties'].get('site', airport_id)  # Add site name
         }
+        # Precompute the keyword flags so readers can skip the raw observation scans
+        airport_weather.update(get_station_conditions(airport_weather))
         # Append parsed data for the airport
         parsed_data[airport_id] = airport_weather
 
@@ -410,15 +876,70 @@ def parse_weather(metar_data):
 
 def get_missing_airports(weather_data):
     """Return a list of airports with missing weather data."""
-    missing_airports = []
-    for airport_code, weather_info in weather_data.items():
-        if weather_info.get('flt_cat', 'MISSING') == 'MISSING':
-            missing_airports.append(airport_code)
-    return missing_airports
+    return get_condition_index(weather_data)['missing']
+
+def merge_weather_data(previous, latest, ttl, airport_ids=None, now=None):
+    """
+    Merge a fresh parse into the previous weather data, keeping the last good
+    observation for stations the API skipped this cycle.
+
+    Args:
+        previous: Station dict from the last merge (entries carry a 'last_seen' epoch time)
+        latest: Station dict from parse_weather for this cycle
+        ttl: Seconds a station's last good observation is kept once the API stops reporting it
+        airport_ids: Optional list of airports still on the map; other stations are not carried over
+        now: Current epoch time (defaults to time.time())
+
+    Returns:
+        tuple: (merged station dict, True if anything other than 'last_seen' changed)
+    """
+    if now is None:
+        now = time.time()
+    previous = previous or {}
+    wanted = set(airport_ids) if airport_ids is not None else None
+
+    merged = {}
+    for airport_code, airport_weather in latest.items():
+        old = previous.get(airport_code)
+        if (airport_weather.get('flt_cat', 'MISSING') == 'MISSING' and old
+                and old.get('flt_cat', 'MISSING') != 'MISSING'
+                and now - old.get('last_seen', 0) <= ttl):
+            # API reported the station but without usable data - keep the last good one
+            merged[airport_code] = old
+        else:
+            merged[airport_code] = dict(airport_weather, last_seen=now)
+
+    carried = []
+    for airport_code, old in previous.items():
+        if airport_code in merged or (wanted is not None and airport_code not in wanted):
+            continue
+        age = now - old.get('last_seen', 0)
+        if age <= ttl:
+            merged[airport_code] = old
+            carried.append(f"{airport_code} ({age / 60:.0f} min)")
+
+    if carried:
+        logging.info(f"Keeping last known observation for {len(carried)} airports: {', '.join(carried)}")
+
+    dropped = [code for code in previous if code not in merged]
+    if dropped:
+        logging.info(f"Dropping airports with no recent observation: {', '.join(dropped)}")
+
+    changed = merged.keys() != previous.keys() or any(
+        _without_last_seen(merged[code]) != _without_last_seen(previous[code]) for code in merged
+    )
+    return merged, changed
+
+def _without_last_seen(airport_weather):
+    """Return a station entry minus its bookkeeping timestamp, for change detection."""
+    return {k: v for k, v in airport_weather.items() if k != 'last_seen'}
 
 def main():
     """Main function to fetch and process weather data."""
     metar_data = fetch_metar()
+    if metar_data is NOT_MODIFIED:
+        touch_weather_file()
+        return
     if not metar_data:
         logging.error("Failed to fetch METAR data")
         return
@@ -429,12 +950,7 @@ def main():
         return
 
     # Always save the data to update the file timestamp
-    try:
-        with open('/home/pi/weather.json', 'w') as json_file:
-            json.dump(parsed_data, json_file, indent=4)
-            logging.info("Weather data saved to /home/pi/weather.json with updated timestamp")
-    except Exception as e:
-        logging.error(f"Failed to write weather data to file: {e}")
+    write_weather_data(parsed_data)
 
     # Only log status table if called by scheduler (check parent process)
     ppid = os.getppid()